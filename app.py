@@ -1,7 +1,17 @@
+import atexit
 from flask import Flask
 from config import Config
 from extensions import db, login_manager, cache
 from models import User
+from migrations import check_query_plans_command, db_upgrade_command, upgrade_schema
+from services.identity import load_principal
+from services.ledger import rebuild_ledger_command
+from services.metrics import init_metrics
+from services.refresher import quote_refresher
+from services.symbols import get_symbol_master, load_symbols_command
+from services.guard import get_upstream_guard
+from services.quotes import GuardedQuoteProvider, YFinanceProvider, quote_service
+from services.jobs import shutdown_job_runner
 
 def create_app(config_class=Config):
     app = Flask(__name__)
@@ -12,24 +22,67 @@ def create_app(config_class=Config):
     login_manager.init_app(app)
     cache.init_app(app)
 
-    @login_manager.user_loader
-    def load_user(user_id):
-        return User.query.get(int(user_id))
+    # Request, SQL, cache and upstream instrumentation, served at /metrics
+    if app.config['METRICS_ENABLED']:
+        init_metrics(app, cache)
+
+    # current_user is a cached Principal, so authenticated requests don't query the user table
+    login_manager.user_loader(load_principal)
 
     # Register Blueprints
     from routes.auth import auth_bp
     from routes.api import api_bp
     from routes.market import market_bp
+    from routes.jobs import jobs_bp
     from routes.views import views_bp
+    from routes.metrics import metrics_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(api_bp, url_prefix='/api')
     app.register_blueprint(market_bp, url_prefix='/api/market')
+    app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
     app.register_blueprint(views_bp)
+    if app.config['METRICS_ENABLED']:
+        app.register_blueprint(metrics_bp)
+
+    # Maintenance commands (flask --app app <command>)
+    app.cli.add_command(rebuild_ledger_command)
+    app.cli.add_command(db_upgrade_command)
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(load_symbols_command)
+
+    # Bare tickers resolve through the symbol master; its index is only opened on first lookup
+    get_symbol_master(app)
+
+    # Quotes fetched by any worker are stored in the shared cache for the others
+    quote_service.shared = cache
+
+    # Yahoo quote fetches go through the shared upstream guard
+    if isinstance(quote_service.provider, YFinanceProvider):
+        quote_service.provider.timeout = app.config['QUOTE_FETCH_TIMEOUT']
+    if app.config['UPSTREAM_GUARD_ENABLED'] and not isinstance(quote_service.provider, GuardedQuoteProvider):
+        quote_service.provider = GuardedQuoteProvider(quote_service.provider, get_upstream_guard(app, 'yahoo'))
+
+    # Background quote refresher: started by the first request so that one-off
+    # scripts importing the app never spawn it, stopped at interpreter exit.
+    # Every worker runs one; only the leader among them calls upstream
+    if app.config['QUOTE_REFRESHER_ENABLED']:
+        quote_refresher.interval = app.config['QUOTE_REFRESH_INTERVAL']
+        quote_refresher.poll = app.config['QUOTE_REFRESH_POLL']
+
+        @app.before_request
+        def start_quote_refresher():
+            quote_refresher.start(app)
+
+        atexit.register(quote_refresher.stop)
+
+    # The job pool is created on first submit; don't leave its processes behind
+    atexit.register(shutdown_job_runner)
 
-    # Create DB tables if they don't exist
-    with app.app_context():
-        db.create_all()
+    # Create DB tables if they don't exist and apply pending migrations
+    if app.config['AUTO_UPGRADE_SCHEMA']:
+        with app.app_context():
+            upgrade_schema()
 
     return app
 
@@ -0,0 +1,454 @@
+"""Offline load benchmark for every /api and /api/market endpoint.
+
+Seeds a SQLite database at realistic scale, replaces Yahoo Finance and the
+RSS feeds with the deterministic local fakes (StaticQuoteProvider,
+StaticHistoryProvider, LocalFeedSource) at a configurable latency, and drives
+each endpoint at a fixed concurrency through the app built by create_app().
+No network access is needed.
+
+The seeded database is kept in --workdir and reused by later runs with the
+same size and seed; each run works on a fresh copy of it, so runs are
+comparable. Results (p50/p95/p99 latency, throughput, SQL statements per
+request) are printed and optionally saved as JSON; --compare prints the
+change against an earlier results file.
+
+    python benchmarks/load.py --users 10000 --transactions 5000000 --output load.json
+    python benchmarks/load.py --output after.json --compare load.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PASSWORD = "bench-password"
+EXPENSES = ("Groceries", "Dining Out", "Entertainment", "Transport", "Utilities", "Shopping")
+BUDGETS = EXPENSES[:3]
+HOLDINGS_PER_USER = 5
+SEED_CHUNK = 50000
+WEIGHTS = {"Stocks": 60, "Gold": 20, "Fixed Deposits (FD)": 20}
+
+# Long-lived SSE connection; it has no per-request latency to measure
+SKIPPED = {"GET /api/market/stream": "server-sent event stream"}
+
+
+def workdir_paths(workdir, args):
+    return {
+        "seed": os.path.join(workdir, f"seed-{args.users}u-{args.transactions}t-{args.seed}.db"),
+        "db": os.path.join(workdir, "run.db"),
+        "history": os.path.join(workdir, "history.db"),
+        "cache": os.path.join(workdir, "cache.db"),
+        "guard": os.path.join(workdir, "guard.db"),
+        "symbols": os.path.join(workdir, "symbol_index"),
+        "metrics": os.path.join(workdir, "metrics"),
+    }
+
+
+def bench_env(paths, db_path, args):
+    return dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{db_path}",
+        HISTORY_DB_PATH=paths["history"],
+        CACHE_SQLITE_PATH=paths["cache"],
+        UPSTREAM_GUARD_PATH=paths["guard"],
+        SYMBOL_INDEX_DIR=paths["symbols"],
+        METRICS_DIR=paths["metrics"],
+        # The fakes answer instantly apart from their simulated latency; the
+        # shared rate limit would only turn that into "rate limited" errors
+        UPSTREAM_GUARD_ENABLED="0",
+        PROFILE_SLOW_REQUESTS="0",
+        JOB_WORKERS=str(args.job_workers),
+    )
+
+
+# Seeding (runs in a child interpreter whose DATABASE_URL is the seed file)
+
+def seed(users, transactions, rng_seed):
+    from sqlalchemy import case, func, insert, select
+    from werkzeug.security import generate_password_hash
+    from app import app
+    from models import db, User, Transaction, Budget, Portfolio, LedgerSummary
+    from services.symbols import read_master
+
+    rng = random.Random(rng_seed)
+    now = datetime.now().replace(microsecond=0)
+    # Few iterations: the benchmark logs in dozens of clients and measures the API, not the hash
+    password = generate_password_hash(PASSWORD, method='pbkdf2:sha256:1000')
+    symbols = sorted({r["symbol"] for r in read_master(app.config['SYMBOL_MASTER_PATH'])})
+
+    with app.app_context():
+        db.session.execute(insert(User), [{
+            "email": f"bench{i}@example.com", "name": f"Bench User {i}", "password": password,
+            "initial_balance": 100000.0, "created_at": now, "data_version": 0
+        } for i in range(users)])
+        user_ids = [u for (u,) in db.session.query(User.id).order_by(User.id)]
+
+        db.session.execute(insert(Budget), [{
+            "user_id": uid, "name": name, "limit": 10000.0, "spent": 0.0
+        } for uid in user_ids for name in BUDGETS])
+        db.session.execute(insert(Portfolio), [{
+            "user_id": uid, "symbol": sym, "company_name": sym, "quantity": float(rng.randint(1, 200)),
+            "avg_cost": round(rng.uniform(100, 3000), 2), "added_at": now
+        } for uid in user_ids for sym in rng.sample(symbols, HOLDINGS_PER_USER)])
+
+        span = 3 * 365 * 86400
+        rows = []
+        for n in range(transactions):
+            when = now - timedelta(seconds=rng.randrange(span))
+            if rng.random() < 0.15:
+                amount, category, description = round(rng.uniform(20000, 150000), 2), "Income", "Salary"
+            else:
+                category = rng.choice(EXPENSES)
+                amount, description = -round(rng.uniform(50, 8000), 2), f"{category} payment"
+            rows.append({"user_id": user_ids[n % len(user_ids)], "description": description,
+                         "amount": amount, "category": category, "date": when})
+            if len(rows) == SEED_CHUNK:
+                db.session.execute(insert(Transaction), rows)
+                rows = []
+                print(f"  {n + 1:,} transactions", file=sys.stderr)
+        if rows:
+            db.session.execute(insert(Transaction), rows)
+
+        totals = select(
+            Transaction.user_id,
+            func.sum(case((Transaction.amount > 0, Transaction.amount), else_=0)),
+            func.sum(case((Transaction.amount < 0, -Transaction.amount), else_=0)),
+            func.count(Transaction.id),
+            func.max(Transaction.date)
+        ).group_by(Transaction.user_id)
+        db.session.execute(insert(LedgerSummary).from_select(
+            ["user_id", "total_income", "total_expenses", "tx_count", "last_activity"], totals
+        ))
+        db.session.commit()
+
+
+def ensure_seed(paths, args):
+    if os.path.exists(paths["seed"]) and not args.reseed:
+        return
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(paths["seed"] + suffix):
+            os.remove(paths["seed"] + suffix)
+    print(f"Seeding {args.users:,} users / {args.transactions:,} transactions into {paths['seed']}", file=sys.stderr)
+    tmp = paths["seed"] + ".partial"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    env = bench_env(paths, tmp, args)
+    subprocess.run([sys.executable, os.path.abspath(__file__), "--seed-only", "--users", str(args.users),
+                    "--transactions", str(args.transactions), "--seed", str(args.seed)],
+                   cwd=ROOT, env=env, check=True)
+    os.replace(tmp, paths["seed"])
+
+
+# Fakes
+
+def feed_documents(feeds, items=20):
+    documents = {}
+    base = datetime(2024, 1, 1)
+    for f in feeds:
+        entries = "".join(
+            f"<item><title>{f['source']} story {i}</title><link>https://example.com/{f['type']}/{i}</link>"
+            f"<description>Offline benchmark story {i}</description>"
+            f"<pubDate>{(base + timedelta(hours=i)).strftime('%a, %d %b %Y %H:%M:%S +0000')}</pubDate></item>"
+            for i in range(items)
+        )
+        documents[f["url"]] = f'<?xml version="1.0"?><rss version="2.0"><channel><title>{f["source"]}</title>{entries}</channel></rss>'
+    return documents
+
+
+def install_fakes(app, args):
+    from services import history, news
+    from services.quotes import StaticQuoteProvider, quote_service
+    quote_service.provider = StaticQuoteProvider(latency=args.quote_latency)
+    history.history_store = history.HistoryStore(
+        app.config['HISTORY_DB_PATH'],
+        provider=history.StaticHistoryProvider(latency=args.history_latency),
+        refresh_interval=app.config['HISTORY_REFRESH_INTERVAL']
+    )
+    news.news_aggregator = news.NewsAggregator(
+        source=news.LocalFeedSource(feed_documents(news.FEEDS), latency=args.feed_latency),
+        ttl=app.config['NEWS_TTL'], timeout=app.config['NEWS_FEED_TIMEOUT']
+    )
+
+
+# Endpoint cases: name -> build(client, n) returning (path, request kwargs).
+# build() runs outside the timed section, so it may create what a DELETE removes.
+
+def _latest_id(client, path, key=None):
+    data = client.get(path).get_json()
+    rows = data[key] if key else data
+    return max(r["id"] for r in rows)
+
+
+def _statement(n):
+    lines = ["date,description,amount,category"]
+    day = datetime(2024, 1, 1) + timedelta(days=n % 365)
+    lines += [f"{day:%Y-%m-%d},Imported {n}-{i},{-100 - i}.50,Groceries" for i in range(20)]
+    return "\n".join(lines).encode()
+
+
+def _submit_job(client, seed):
+    resp = client.post('/api/jobs', json={"kind": "projection", "params": {"weights": WEIGHTS, "paths": 500, "seed": seed}})
+    return resp.get_json()["data"]["id"]
+
+
+def _job_id(client, n):
+    if not hasattr(client, "bench_job"):
+        client.bench_job = _submit_job(client, 0)
+    return f"/api/jobs/{client.bench_job}", {}
+
+
+def _post_and_latest(create, listing, key=None, prefix=None):
+    def build(client, n):
+        client.post(create[0], json=create[1](n))
+        return f"{prefix}/{_latest_id(client, listing, key)}", {}
+    return build
+
+
+def make_cases(symbols):
+    since = (datetime.now() - timedelta(days=90)).date().isoformat()
+    tx_body = lambda n: {"description": f"Bench {n}", "amount": -250.0, "category": "Groceries"}
+    budget_body = lambda n: {"name": f"Bench {n}", "limit": 5000}
+    holding_body = lambda n: {"symbol": symbols[n % len(symbols)], "quantity": 10, "avg_cost": 1000}
+    return {
+        "GET /api/dashboard": lambda c, n: ("/api/dashboard", {}),
+        "GET /api/dashboard/timeseries": lambda c, n: ("/api/dashboard/timeseries?interval=month&periods=12", {}),
+        "POST /api/user/balance": lambda c, n: ("/api/user/balance", {"json": {"balance": 100000 + n}}),
+        "GET /api/transactions": lambda c, n: ("/api/transactions?limit=50", {}),
+        "GET /api/transactions/export": lambda c, n: (f"/api/transactions/export?format=csv&start={since}", {}),
+        "POST /api/transactions": lambda c, n: ("/api/transactions", {"json": tx_body(n)}),
+        "POST /api/transactions/import": lambda c, n: ("/api/transactions/import?format=csv", {
+            "data": {"file": (io.BytesIO(_statement(n)), "statement.csv")}}),
+        "DELETE /api/transactions/<id>": _post_and_latest(("/api/transactions", tx_body),
+                                                          "/api/transactions?limit=1", "transactions",
+                                                          "/api/transactions"),
+        "POST /api/simulation": lambda c, n: ("/api/simulation", {"json": {"cost": 500, "monthly": 5000, "rate": 12,
+                                                                            "years": 10 + n % 20}}),
+        "GET /api/budgets": lambda c, n: ("/api/budgets", {}),
+        "POST /api/budgets": lambda c, n: ("/api/budgets", {"json": budget_body(n)}),
+        "DELETE /api/budgets/<id>": _post_and_latest(("/api/budgets", budget_body), "/api/budgets",
+                                                     prefix="/api/budgets"),
+        "GET /api/portfolio": lambda c, n: ("/api/portfolio", {}),
+        "POST /api/portfolio": lambda c, n: ("/api/portfolio", {"json": holding_body(n)}),
+        "PUT /api/portfolio/<id>": lambda c, n: (f"/api/portfolio/{_latest_id(c, '/api/portfolio')}",
+                                                 {"json": {"quantity": 10 + n % 50, "avg_cost": 1000}}),
+        "DELETE /api/portfolio/<id>": _post_and_latest(("/api/portfolio", holding_body), "/api/portfolio",
+                                                       prefix="/api/portfolio"),
+        "GET /api/portfolio/valuation": lambda c, n: ("/api/portfolio/valuation", {}),
+        "GET /api/portfolio/risk": lambda c, n: ("/api/portfolio/risk", {}),
+        "POST /api/invest/ai": lambda c, n: ("/api/invest/ai", {"json": {"amount": 500000, "risk": "medium",
+                                                                          "age": 25 + n % 40, "years": 15}}),
+        "POST /api/jobs": lambda c, n: ("/api/jobs", {"json": {"kind": "projection",
+                                                                "params": {"weights": WEIGHTS, "paths": 500, "seed": 0}}}),
+        "GET /api/jobs/<id>": _job_id,
+        "DELETE /api/jobs/<id>": lambda c, n: (f"/api/jobs/{_submit_job(c, 1000 + n)}", {}),
+        "GET /api/market/indices": lambda c, n: ("/api/market/indices", {}),
+        "POST /api/market/stocks": lambda c, n: ("/api/market/stocks", {"json": {"symbols": symbols[:10]}}),
+        "GET /api/market/search": lambda c, n: (f"/api/market/search?q={symbols[n % len(symbols)][:3]}", {}),
+        "GET /api/market/quotes/status": lambda c, n: ("/api/market/quotes/status", {}),
+        "GET /api/market/history/<symbol>": lambda c, n: (f"/api/market/history/{symbols[n % 10]}.NS", {}),
+        "GET /api/market/news": lambda c, n: ("/api/market/news", {}),
+    }
+
+
+def check_coverage(app, cases):
+    """Every /api route needs a case (or a reason in SKIPPED), so new endpoints are not silently left out."""
+    import re
+    routes = set()
+    for rule in app.url_map.iter_rules():
+        if rule.rule.startswith('/api'):
+            path = re.sub(r'<(?:[^:>]+:)?(\w+)>', lambda m: '<id>' if m.group(1).endswith('id') else f'<{m.group(1)}>',
+                          rule.rule)
+            routes |= {f"{m} {path}" for m in rule.methods - {'HEAD', 'OPTIONS'}}
+    missing = routes - set(cases) - set(SKIPPED)
+    if missing:
+        raise SystemExit(f"No benchmark case for: {', '.join(sorted(missing))}")
+
+
+# Load driver
+
+def login(app, n):
+    client = app.test_client()
+    resp = client.post('/login', data={"email": f"bench{n}@example.com", "password": PASSWORD})
+    if 'login' in resp.headers.get('Location', 'login'):
+        raise SystemExit(f"Could not log in bench{n}@example.com")
+    return client
+
+
+def sql_counts(endpoint):
+    from services.metrics import metrics
+    counters, _ = metrics.collect()
+    return counters.get(("sql_queries_total", (("endpoint", endpoint),)), 0)
+
+
+def run_case(app, name, build, clients, args):
+    method = name.split()[0]
+    counter = iter(range(args.warmup + args.requests))
+    counter_lock = threading.Lock()
+    latencies, errors, window = [], [], [float('inf'), 0.0]
+    results_lock = threading.Lock()
+
+    def worker(own_clients):
+        k = 0
+        while True:
+            with counter_lock:
+                n = next(counter, None)
+            if n is None:
+                return
+            client = own_clients[k % len(own_clients)]
+            k += 1
+            path, kwargs = build(client, n)
+            start = time.perf_counter()
+            resp = client.open(path, method=method, **kwargs)
+            resp.get_data()  # Streamed bodies count in full
+            elapsed = time.perf_counter() - start
+            resp.close()
+            if n < args.warmup:
+                continue
+            with results_lock:
+                latencies.append(elapsed)
+                window[0], window[1] = min(window[0], start), max(window[1], start + elapsed)
+                if resp.status_code >= 400:
+                    errors.append(resp.status_code)
+
+    path = build(clients[0], 0)[0].split('?')[0]
+    endpoint = app.url_map.bind('localhost').match(path, method=method)[0]
+    threads = [threading.Thread(target=worker, args=(clients[t::args.concurrency],)) for t in range(args.concurrency)]
+    sql_before = sql_counts(endpoint)
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    measured = len(latencies)
+    q = statistics.quantiles(latencies, n=100, method='inclusive')
+    return {
+        "requests": measured,
+        "errors": len(errors),
+        "error_statuses": sorted(set(errors)),
+        "p50_ms": round(q[49] * 1000, 3),
+        "p95_ms": round(q[94] * 1000, 3),
+        "p99_ms": round(q[98] * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        # Over the span of the measured requests; the untimed build() steps still occupy it
+        "throughput_rps": round(measured / (window[1] - window[0]), 1),
+        "sql_per_request": round((sql_counts(endpoint) - sql_before) / (measured + args.warmup), 2),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["endpoints"]
+    print(f"\n{'endpoint':<36} {'p50 ms':>16} {'p99 ms':>16} {'req/s':>16}")
+    for name, r in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        cells = [f"{old[k]:>7} -> {r[k]:<7}" for k in ("p50_ms", "p99_ms", "throughput_rps")]
+        print(f"{name:<36} {' '.join(cells)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=42, help="random seed for the generated data")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--clients", type=int, default=32, help="distinct logged-in users sending requests")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per endpoint")
+    parser.add_argument("--only", help="comma-separated substrings; run only matching endpoints")
+    parser.add_argument("--quote-latency", type=float, default=0.05, help="seconds per fake quote fetch")
+    parser.add_argument("--history-latency", type=float, default=0.2, help="seconds per fake history fetch")
+    parser.add_argument("--feed-latency", type=float, default=0.1, help="seconds per fake RSS fetch")
+    parser.add_argument("--job-workers", type=int, default=2)
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "finance-load-bench"))
+    parser.add_argument("--reseed", action="store_true", help="rebuild the seeded database")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--seed-only", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.requests < 2:
+        parser.error("--requests must be at least 2")
+
+    sys.path.insert(0, ROOT)
+    if args.seed_only:
+        seed(args.users, args.transactions, args.seed)
+        return
+
+    os.makedirs(args.workdir, exist_ok=True)
+    paths = workdir_paths(args.workdir, args)
+    ensure_seed(paths, args)
+
+    # Every run starts from the same data and cold local caches
+    for name in ("db", "history", "cache", "guard"):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(paths[name] + suffix):
+                os.remove(paths[name] + suffix)
+    shutil.rmtree(paths["metrics"], ignore_errors=True)
+    shutil.copyfile(paths["seed"], paths["db"])
+    os.environ.update(bench_env(paths, paths["db"], args))
+
+    from app import create_app
+    from services.symbols import read_master
+    app = create_app()
+    install_fakes(app, args)
+    symbols = sorted({r["symbol"] for r in read_master(app.config['SYMBOL_MASTER_PATH']) if r["exchange"] == "NSE"})
+    cases = make_cases(symbols)
+    check_coverage(app, cases)
+    if args.only:
+        wanted = args.only.split(',')
+        cases = {k: v for k, v in cases.items() if any(w in k for w in wanted)}
+
+    clients = [login(app, n) for n in range(min(args.clients, args.users))]
+    if len(clients) < args.concurrency:
+        raise SystemExit("--clients (and --users) must be at least --concurrency")
+
+    results = {}
+    for name, build in cases.items():
+        results[name] = run_case(app, name, build, clients, args)
+        r = results[name]
+        print(f"{name:<36} p50 {r['p50_ms']:>9.2f} ms  p95 {r['p95_ms']:>9.2f} ms  p99 {r['p99_ms']:>9.2f} ms  "
+              f"{r['throughput_rps']:>8.1f} req/s  sql {r['sql_per_request']:>5}  errors {r['errors']}",
+              file=sys.stderr)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "seed_only", "reseed")},
+            "skipped": SKIPPED,
+        },
+        "endpoints": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(json.dumps(report, indent=2) + "\n")
+    if args.compare:
+        compare(results, args.compare)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Measure cold-start cost: importing app.py and serving the first requests.
+
+Each run is a fresh interpreter against a throwaway SQLite database, so
+nothing is shared between runs and no network access is needed.
+
+    python benchmarks/startup.py --runs 5 --output startup.json
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("numpy", "pandas", "yfinance", "feedparser")
+
+# Runs inside the child interpreter; prints one JSON line
+PROBE = """
+import sys, json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+client = app.app.test_client()
+client.get('/login')
+t2 = time.perf_counter()
+client.get('/api/dashboard')
+t3 = time.perf_counter()
+print(json.dumps({
+    "import_s": t1 - t0,
+    "first_request_s": t2 - t1,
+    "second_route_s": t3 - t2,
+    "heavy_modules_loaded": [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def run_once(db_path, upgrade):
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{db_path}",
+        QUOTE_REFRESHER_ENABLED="0",
+        AUTO_UPGRADE_SCHEMA="1" if upgrade else "0",
+    )
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def summarize(samples, key):
+    values = [s[key] for s in samples]
+    return {"median": round(statistics.median(values), 4), "min": round(min(values), 4), "max": round(max(values), 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "startup.db")
+        # First boot creates the schema; it is reported on its own
+        results["first_boot"] = {k: round(v, 4) if isinstance(v, float) else v
+                                 for k, v in run_once(db_path, upgrade=True).items()}
+        for label, upgrade in (("boot_with_upgrade_check", True), ("boot_without_upgrade", False)):
+            samples = [run_once(db_path, upgrade) for _ in range(args.runs)]
+            results[label] = {
+                key: summarize(samples, key) for key in ("import_s", "first_request_s", "second_route_s")
+            }
+            results[label]["heavy_modules_loaded"] = samples[-1]["heavy_modules_loaded"]
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
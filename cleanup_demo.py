@@ -1,4 +1,6 @@
 from app import app, db, User, Transaction, Budget
+from models import LedgerSummary
+from services.identity import invalidate_user
 
 def delete_user_safely(email):
     with app.app_context():
@@ -13,12 +15,14 @@ def delete_user_safely(email):
         # 1. Transactions
         tx_count = Transaction.query.filter_by(user_id=user.id).delete()
         print(f"Deleted {tx_count} transactions.")
+        LedgerSummary.query.filter_by(user_id=user.id).delete()
 
         # 2. Budgets
         budget_count = Budget.query.filter_by(user_id=user.id).delete()
         print(f"Deleted {budget_count} budgets.")
 
         # 3. User
+        invalidate_user(user.id)
         db.session.delete(user)
         db.session.commit()
         print(f"Successfully deleted user {email} and all associated data.")
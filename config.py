@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 basedir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
@@ -15,5 +16,72 @@ class Config:
     SQLALCHEMY_DATABASE_URI = db_url or ('sqlite:///' + os.path.join(basedir, 'finance_v2.db'))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
-    CACHE_TYPE = os.environ.get('CACHE_TYPE', 'SimpleCache')
+    # Apply pending migrations in create_app. Deployments that run `flask db-upgrade`
+    # (or preload the app in the gunicorn master) can turn this off for workers and scripts
+    AUTO_UPGRADE_SCHEMA = os.environ.get('AUTO_UPGRADE_SCHEMA', '1') == '1'
+
+    # Shared by all workers on the host; set CACHE_TYPE=SimpleCache for a per-process cache
+    CACHE_TYPE = os.environ.get('CACHE_TYPE', 'services.sharedcache.SQLiteCache')
     CACHE_DEFAULT_TIMEOUT = int(os.environ.get('CACHE_DEFAULT_TIMEOUT', 60))
+    CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH', os.path.join(basedir, 'cache.db'))
+    CACHE_STALE_TTL = int(os.environ.get('CACHE_STALE_TTL', 300))
+    CACHE_LEASE_TIMEOUT = int(os.environ.get('CACHE_LEASE_TIMEOUT', 30))
+
+    # Logged-in user's identity columns, cached per user (services/identity.py); 0 disables
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+
+    # Background quote refresher (services/refresher.py)
+    QUOTE_REFRESHER_ENABLED = os.environ.get('QUOTE_REFRESHER_ENABLED', '1') == '1'
+    QUOTE_REFRESH_INTERVAL = int(os.environ.get('QUOTE_REFRESH_INTERVAL', 30))
+    # How often workers that aren't refreshing pick up the leader's quotes and pass on their watched symbols
+    QUOTE_REFRESH_POLL = float(os.environ.get('QUOTE_REFRESH_POLL', 2))
+
+    # Live quote stream (/api/market/stream)
+    STREAM_HEARTBEAT = int(os.environ.get('STREAM_HEARTBEAT', 15))
+    STREAM_MAX_DURATION = int(os.environ.get('STREAM_MAX_DURATION', 300))
+    STREAM_MAX_CONNECTIONS = int(os.environ.get('STREAM_MAX_CONNECTIONS', 24))
+
+    # On-disk daily price history shared by all workers (services/history.py)
+    HISTORY_DB_PATH = os.environ.get('HISTORY_DB_PATH', os.path.join(basedir, 'price_history.db'))
+    HISTORY_REFRESH_INTERVAL = int(os.environ.get('HISTORY_REFRESH_INTERVAL', 3600))
+
+    # Local symbol master and its memory-mapped search index (services/symbols.py)
+    # A small NSE seed master ships with the code (load the full NSE/BSE lists with `flask load-symbols`);
+    # the generated index lives with the other local data files
+    SYMBOL_MASTER_PATH = os.environ.get('SYMBOL_MASTER_PATH',
+                                        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'symbols.csv'))
+    SYMBOL_INDEX_DIR = os.environ.get('SYMBOL_INDEX_DIR', os.path.join(basedir, 'symbol_index'))
+
+    # RSS news aggregation (services/news.py)
+    NEWS_TTL = int(os.environ.get('NEWS_TTL', 600))
+    NEWS_FEED_TIMEOUT = int(os.environ.get('NEWS_FEED_TIMEOUT', 5))
+
+    # Guard in front of Yahoo Finance and the RSS feeds, shared by all workers (services/guard.py)
+    UPSTREAM_GUARD_ENABLED = os.environ.get('UPSTREAM_GUARD_ENABLED', '1') == '1'
+    UPSTREAM_GUARD_PATH = os.environ.get('UPSTREAM_GUARD_PATH', os.path.join(basedir, 'upstream_guard.db'))
+    UPSTREAM_RATE = float(os.environ.get('UPSTREAM_RATE', 2))  # requests per second
+    UPSTREAM_BURST = int(os.environ.get('UPSTREAM_BURST', 60))
+    UPSTREAM_FAILURE_THRESHOLD = int(os.environ.get('UPSTREAM_FAILURE_THRESHOLD', 5))
+    UPSTREAM_RESET_TIMEOUT = int(os.environ.get('UPSTREAM_RESET_TIMEOUT', 60))
+    NEGATIVE_CACHE_TTL = int(os.environ.get('NEGATIVE_CACHE_TTL', 3600))
+    QUOTE_FETCH_TIMEOUT = int(os.environ.get('QUOTE_FETCH_TIMEOUT', 10))
+
+    # Prometheus metrics at /metrics, summed across workers through per-process files (services/metrics.py)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'finance-metrics'))
+    METRICS_FLUSH_INTERVAL = int(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # When set, scrapes need "Authorization: Bearer <token>"
+
+    # Opt-in profiler: a sample of requests runs under cProfile and slow ones are saved to PROFILE_DIR
+    PROFILE_SLOW_REQUESTS = os.environ.get('PROFILE_SLOW_REQUESTS', '0') == '1'
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.1))
+    PROFILE_SLOW_MS = int(os.environ.get('PROFILE_SLOW_MS', 500))
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(basedir, 'profiles'))
+
+    # Background jobs run on a local process pool (services/jobs.py)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_RESULT_TTL = int(os.environ.get('JOB_RESULT_TTL', 3600))
+    # The worker running a job stamps it every JOB_HEARTBEAT_INTERVAL seconds; a job whose
+    # stamp is older than JOB_TIMEOUT, or whose worker on this host has exited, is reported lost
+    JOB_HEARTBEAT_INTERVAL = int(os.environ.get('JOB_HEARTBEAT_INTERVAL', 15))
+    JOB_TIMEOUT = int(os.environ.get('JOB_TIMEOUT', 120))
@@ -0,0 +1,35 @@
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+worker_class = "gthread"
+threads = int(os.environ.get('GUNICORN_THREADS', 32))
+
+# Import the app (and run pending migrations) once in the master; workers are
+# forked from it and share the already-imported code instead of each re-importing
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+
+def on_starting(server):
+    # Per-worker metric files from a previous run would otherwise be added to this one's
+    from config import Config
+    from services.metrics import clear_metrics_dir
+    clear_metrics_dir(Config.METRICS_DIR)
+
+
+def post_fork(server, worker):
+    from app import app
+    from extensions import db
+    from services.metrics import metrics
+    from services.refresher import quote_refresher
+
+    # Pooled connections opened by the master must not be shared with the children
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+    # Only serving workers publish metric files; scripts and CLI commands keep theirs in memory
+    if app.config['METRICS_ENABLED']:
+        metrics.publish()
+
+    # Threads don't survive fork, so each worker starts its own refresher; they elect one to call upstream
+    if app.config['QUOTE_REFRESHER_ENABLED']:
+        quote_refresher.start(app)
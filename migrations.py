@@ -0,0 +1,176 @@
+import re
+import click
+from datetime import datetime
+from sqlalchemy import inspect, text
+from models import db
+
+
+# Versioned schema migrations. Each step must be idempotent: several gunicorn
+# workers may race to apply it, and a database created by create_all() already
+# contains everything up to the current models.
+def _baseline(conn):
+    db.metadata.create_all(conn)
+
+
+def _create_indexes(*names):
+    def step(conn):
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name in names:
+                    index.create(conn, checkfirst=True)
+    return step
+
+
+def _create_tables(*names):
+    def step(conn):
+        for name in names:
+            db.metadata.tables[name].create(conn, checkfirst=True)
+    return step
+
+
+def add_column(conn, table, column_ddl):
+    """ALTER TABLE ... ADD COLUMN unless the column already exists."""
+    name = column_ddl.split()[0]
+    if name not in {c['name'] for c in inspect(conn).get_columns(table)}:
+        conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column_ddl}'))
+
+
+def _add_import_hash(conn):
+    add_column(conn, 'transaction', 'import_hash VARCHAR(64)')
+    _create_indexes('ix_transaction_user_import_hash')(conn)
+
+
+def _keyset_index(conn):
+    _create_indexes('ix_transaction_user_date_id')(conn)
+    # Superseded: (user_id, date DESC, id DESC) serves every query it did
+    conn.execute(text("DROP INDEX IF EXISTS ix_transaction_user_date"))
+
+
+def _add_holdings(conn):
+    add_column(conn, 'portfolio', 'quantity FLOAT NOT NULL DEFAULT 0')
+    add_column(conn, 'portfolio', 'avg_cost FLOAT NOT NULL DEFAULT 0')
+
+
+def _add_job_owner(conn):
+    add_column(conn, 'job', 'owner VARCHAR(100)')
+    add_column(conn, 'job', 'heartbeat_at TIMESTAMP')
+
+
+MIGRATIONS = [
+    (1, "baseline schema", _baseline),
+    (2, "composite indexes on hot access paths", _create_indexes(
+        'ix_transaction_user_date', 'ix_transaction_user_category_date', 'ix_portfolio_user', 'ix_budget_user'
+    )),
+    (3, "transaction import hash", _add_import_hash),
+    (4, "keyset index on transaction (user_id, date, id)", _keyset_index),
+    (5, "per-user data version", lambda conn: add_column(conn, 'user', 'data_version INTEGER NOT NULL DEFAULT 0')),
+    (6, "background jobs table", _create_tables('job')),
+    (7, "portfolio quantity and average cost", _add_holdings),
+    (8, "job owner and heartbeat", _add_job_owner),
+]
+
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, description VARCHAR(200) NOT NULL, applied_at TIMESTAMP NOT NULL)"
+    ))
+
+
+def current_version(conn):
+    _ensure_version_table(conn)
+    return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+
+def upgrade_schema(engine=None):
+    """Apply pending migrations in order; returns the list of versions applied."""
+    engine = engine or db.engine
+    with engine.connect() as conn:
+        # Up to date (the usual case on boot): skip the per-step transactions and advisory lock
+        if current_version(conn) >= MIGRATIONS[-1][0]:
+            conn.commit()
+            return []
+    applied = []
+    for version, description, step in MIGRATIONS:
+        with engine.begin() as conn:
+            if conn.dialect.name == 'postgresql':
+                # Serialise concurrent upgraders across workers for the rest of this transaction
+                conn.execute(text("SELECT pg_advisory_xact_lock(7215530101)"))
+            if current_version(conn) >= version:
+                continue
+            step(conn)
+            conn.execute(
+                text("INSERT INTO schema_version (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {"v": version, "d": description, "t": datetime.utcnow()}
+            )
+            applied.append(version)
+    return applied
+
+
+@click.command('db-upgrade')
+def db_upgrade_command():
+    """Apply pending schema migrations."""
+    applied = upgrade_schema()
+    with db.engine.connect() as conn:
+        version = current_version(conn)
+    click.echo(f"Applied {applied or 'nothing'}; schema is at version {version}.")
+
+
+# Queries served on every dashboard, budget and portfolio load. Each must be
+# answerable from an index for a single user.
+HOT_TABLES = ('transaction', 'portfolio', 'budget')
+
+
+def hot_queries(user_id=1):
+    from models import Budget, Portfolio, Transaction
+    from services.budgets import period_bounds, spend_query
+    from services.ledger import totals_query
+    from services.timeseries import buckets_query
+    from services.transactions import ledger_query
+
+    start, end = period_bounds('month')
+    return {
+        "recent transactions": Transaction.query.filter_by(user_id=user_id)
+            .order_by(Transaction.date.desc()).limit(5),
+        "transaction page": ledger_query(user_id).filter(
+            Transaction.date < datetime(2030, 1, 1)).limit(51),
+        "ledger totals": totals_query(user_id),
+        "monthly buckets": buckets_query(user_id, 'month'),
+        "budget spend": spend_query(user_id, ['Groceries', 'Dining Out'], start, end),
+        "budgets": Budget.query.filter_by(user_id=user_id),
+        "portfolio": Portfolio.query.filter_by(user_id=user_id),
+    }
+
+
+def explain(conn, query):
+    compiled = query.statement.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(compiled.params[k] for k in compiled.positiontup) if compiled.positional else compiled.params
+    if conn.dialect.name == 'postgresql':
+        # Tiny tables always seq-scan; disabling it shows whether an index *could* serve the query
+        conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        rows = conn.exec_driver_sql("EXPLAIN " + str(compiled), params).fetchall()
+        return [r[0] for r in rows]
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params).fetchall()
+    return [r[-1] for r in rows]
+
+
+def full_scans(plan_lines):
+    tables = '|'.join(HOT_TABLES)
+    pattern = re.compile(rf'^\s*(?:->\s*)?(?:SCAN|Seq Scan on) "?({tables})"?\b', re.IGNORECASE)
+    return [line for line in plan_lines if pattern.search(line)]
+
+
+@click.command('check-query-plans')
+def check_query_plans_command():
+    """Fail if a hot API query needs a full table scan."""
+    failures = 0
+    with db.engine.begin() as conn:
+        for name, query in hot_queries().items():
+            plan = explain(conn, query)
+            scans = full_scans(plan)
+            failures += bool(scans)
+            click.echo(f"{'FAIL' if scans else 'ok  '} {name}")
+            for line in plan:
+                click.echo(f"       {line}")
+    if failures:
+        raise click.ClickException(f"{failures} hot quer{'y' if failures == 1 else 'ies'} fell back to a full table scan")
@@ -11,6 +11,7 @@ class User(UserMixin, db.Model):
     name = db.Column(db.String(100), nullable=False)
     initial_balance = db.Column(db.Float, default=100000.0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    data_version = db.Column(db.Integer, nullable=False, default=0) # Bumped on every write to the user's data
     
     # Relationships
     transactions = db.relationship('Transaction', backref='user', lazy=True)
@@ -24,14 +25,41 @@ class Transaction(db.Model):
     amount = db.Column(db.Float, nullable=False) # Negative for expense, Positive for income
     category = db.Column(db.String(50), nullable=False)
     date = db.Column(db.DateTime, default=datetime.utcnow)
+    import_hash = db.Column(db.String(64)) # Set for rows loaded by the statement importer
+
+class LedgerSummary(db.Model):
+    # Running totals kept in step with Transaction by services/ledger.py
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    total_income = db.Column(db.Float, nullable=False, default=0.0)
+    total_expenses = db.Column(db.Float, nullable=False, default=0.0) # Stored as a positive amount
+    tx_count = db.Column(db.Integer, nullable=False, default=0)
+    last_activity = db.Column(db.DateTime)
 
 class Portfolio(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     symbol = db.Column(db.String(20), nullable=False)
     company_name = db.Column(db.String(100))
+    quantity = db.Column(db.Float, nullable=False, default=0.0) # 0 for watchlist-only entries
+    avg_cost = db.Column(db.Float, nullable=False, default=0.0)
     added_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class Job(db.Model):
+    # Background computations run by services/jobs.py
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(50), nullable=False)
+    input_hash = db.Column(db.String(64), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued') # queued, running, done, failed, cancelled
+    params = db.Column(db.Text, nullable=False)
+    result = db.Column(db.Text)
+    error = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    # host:pid of the web worker whose pool runs the job, and its last sign of life
+    owner = db.Column(db.String(100))
+    heartbeat_at = db.Column(db.DateTime)
+
 class Budget(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -40,3 +68,13 @@ class Budget(db.Model):
     spent = db.Column(db.Float, default=0.0)
     icon = db.Column(db.String(50), default='fas fa-wallet')
     color = db.Column(db.String(20), default='#3B82F6')
+
+# Composite indexes matching the API access paths: every query filters on
+# user_id, the ledger pages newest-first on (date, id) and budgets group by
+# category.
+# Existing databases receive these through migrations.py.
+db.Index('ix_transaction_user_date_id', Transaction.user_id, Transaction.date.desc(), Transaction.id.desc())
+db.Index('ix_transaction_user_category_date', Transaction.user_id, Transaction.category, Transaction.date)
+db.Index('ix_transaction_user_import_hash', Transaction.user_id, Transaction.import_hash, unique=True)
+db.Index('ix_portfolio_user', Portfolio.user_id)
+db.Index('ix_budget_user', Budget.user_id)
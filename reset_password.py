@@ -1,10 +1,12 @@
 from app import app, db, User
 from werkzeug.security import generate_password_hash
+from services.identity import invalidate_user
 
 with app.app_context():
     user = User.query.filter_by(email='demo@example.com').first()
     if user:
         user.password = generate_password_hash('password123', method='pbkdf2:sha256')
+        invalidate_user(user.id)
         db.session.commit()
         print(f"Password for {user.email} reset to 'password123'")
     else:
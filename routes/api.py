@@ -1,25 +1,40 @@
 import os
+import csv
 import json
-from flask import Blueprint, request, jsonify
+import math
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from flask_login import login_required, current_user
-from models import db, Transaction, Budget, Portfolio
+from sqlalchemy.exc import IntegrityError
+from models import db, User, Transaction, Budget, Portfolio
+from services.budgets import PERIODS as BUDGET_PERIODS, budgets_with_spend, reconcile as reconcile_budget, record_transaction as record_budget_spend
+from services.importer import import_statement
+from services.jobs import get_job_runner, serialize_job
+from services.ledger import get_summary, record_transaction
+from services.refresher import read_quotes
+from services.symbols import find_symbol
+from services.versioning import bump_data_version, versioned
+from services.transactions import export_csv, export_ndjson, ledger_query, page, serialize as serialize_transaction
+from services.timeseries import INTERVALS, balance_series, extend_series
 from datetime import datetime
 
-import time
 import random
 api_bp = Blueprint('api', __name__)
 
 @api_bp.route('/dashboard')
 @login_required
+@versioned
 def dashboard_api():
-    transactions = Transaction.query.filter_by(user_id=current_user.id).order_by(Transaction.date.desc()).all()
-    
-    income = sum(t.amount for t in transactions if t.amount > 0)
-    expenses = sum(abs(t.amount) for t in transactions if t.amount < 0)
+    summary = get_summary(current_user.id)
+    income = summary.total_income
+    expenses = summary.total_expenses
     current_savings = current_user.initial_balance + income - expenses
     
+    series = balance_series(current_user, 'month', periods=6)
+    
+    recent = Transaction.query.filter_by(user_id=current_user.id).order_by(Transaction.date.desc()).limit(5).all()
+    
     tx_list = []
-    for t in transactions[:5]:
+    for t in recent:
         tx_list.append({
             "id": t.id,
             "desc": t.description,
@@ -34,22 +49,77 @@ def dashboard_api():
         "expenses": expenses,
         "transactions": tx_list,
         "chart": {
-            "labels": ["Jan", "Feb", "Mar", "Apr", "May", "Jun"],
-            "data": [current_user.initial_balance, current_user.initial_balance * 1.1, current_user.initial_balance * 1.05, current_user.initial_balance * 1.2, current_user.initial_balance * 1.15, current_savings]
+            "labels": [datetime.strptime(l, '%Y-%m-%d').strftime('%b') for l in series["labels"]],
+            "data": series["balance"]
         }
     })
 
+@api_bp.route('/dashboard/timeseries')
+@login_required
+@versioned
+def timeseries_api():
+    interval = request.args.get('interval', 'month')
+    if interval not in INTERVALS:
+        return jsonify({"status": "error", "message": f"interval must be one of {', '.join(INTERVALS)}"}), 400
+    try:
+        periods = int(request.args['periods']) if 'periods' in request.args else None
+        if periods is not None and periods < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({"status": "error", "message": "periods must be a positive integer"}), 400
+    return jsonify(balance_series(current_user, interval, periods))
+
 @api_bp.route('/user/balance', methods=['POST'])
 @login_required
 def update_initial_balance():
     data = request.get_json(silent=True) or {}
     try:
-        current_user.initial_balance = float(data.get('balance', 100000.0))
+        db.session.get(User, current_user.id).initial_balance = float(data.get('balance', 100000.0))
+        bump_data_version(current_user.id)
         db.session.commit()
         return jsonify({"status": "success"})
     except Exception as e:
         return jsonify({"status": "error", "message": "Invalid balance format"}), 400
 
+def parse_ledger_filters(args):
+    start = datetime.fromisoformat(args['start']) if args.get('start') else None
+    end = datetime.fromisoformat(args['end']) if args.get('end') else None
+    return ledger_query(current_user.id, args.get('category'), start, end)
+
+@api_bp.route('/transactions')
+@login_required
+@versioned
+def list_transactions():
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        query = parse_ledger_filters(request.args)
+        rows, next_cursor = page(query, request.args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify({
+        "transactions": [serialize_transaction(t) for t in rows],
+        "next_cursor": next_cursor
+    })
+
+@api_bp.route('/transactions/export')
+@login_required
+def export_transactions():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({"status": "error", "message": "format must be csv or ndjson"}), 400
+    try:
+        query = parse_ledger_filters(request.args)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    if fmt == 'csv':
+        body, mimetype = export_csv(query), 'text/csv'
+    else:
+        body, mimetype = export_ndjson(query), 'application/x-ndjson'
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename=transactions.{fmt}"
+    })
+
 @api_bp.route('/transactions', methods=['POST'])
 @login_required
 def add_transaction():
@@ -63,18 +133,52 @@ def add_transaction():
             date=datetime.now()
         )
         db.session.add(new_tx)
+        record_transaction(new_tx)
+        record_budget_spend(new_tx)
+        bump_data_version(current_user.id)
         db.session.commit()
+        extend_series(new_tx)
         return jsonify({"status": "success", "message": "Transaction added"})
     except Exception as e:
         return jsonify({"status": "error", "message": "Invalid transaction data"}), 400
 
+@api_bp.route('/transactions/import', methods=['POST'])
+@login_required
+def import_transactions():
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({"status": "error", "message": "Attach a CSV or OFX file as 'file'"}), 400
+
+    fmt = request.args.get('format') or os.path.splitext(upload.filename or '')[1].lstrip('.').lower()
+    fmt = 'ofx' if fmt in ('ofx', 'qfx') else fmt
+    if fmt not in ('csv', 'ofx'):
+        return jsonify({"status": "error", "message": "Unsupported format; use csv or ofx"}), 400
+
+    try:
+        report = import_statement(current_user.id, upload.stream, fmt)
+    except UnicodeDecodeError:
+        db.session.rollback()
+        return jsonify({"status": "error", "message": "File is not UTF-8 text"}), 400
+    except csv.Error as e:
+        # Earlier chunks are committed; importing the fixed file again skips them as duplicates
+        db.session.rollback()
+        return jsonify({"status": "error", "message": f"Malformed CSV: {e}"}), 400
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"status": "error", "message": "Another import of this statement is in progress; retry once it finishes"}), 409
+    return jsonify(dict(report, status="success"))
+
 @api_bp.route('/transactions/<int:tx_id>', methods=['DELETE'])
 @login_required
 def delete_transaction(tx_id):
     tx = Transaction.query.filter_by(id=tx_id, user_id=current_user.id).first()
     if tx:
         db.session.delete(tx)
+        record_transaction(tx, sign=-1)
+        record_budget_spend(tx, sign=-1)
+        bump_data_version(current_user.id)
         db.session.commit()
+        extend_series(tx, sign=-1)
         return jsonify({"status": "success"})
     return jsonify({"status": "error", "message": "Not found"}), 404
 
@@ -82,27 +186,33 @@ def delete_transaction(tx_id):
 @login_required
 def simulation_api():
     data = request.get_json(silent=True) or {}
-    cost = float(data.get('cost', 0))
-    monthly = float(data.get('monthly', 0))
-    
-    years = 10
+    # Any of cost, monthly, rate (percent) and years may be a list; lists switch
+    # to grid mode, which evaluates every combination in one vectorised pass
+    axes = {
+        "cost": data.get('cost', 0),
+        "monthly": data.get('monthly', 0),
+        "rate": data.get('rate', 12),
+        "years": data.get('years', 10)
+    }
+    mode = data.get('mode')
+    from services.simulation import check_axes, yearly_trend
+    try:
+        axes = {k: [float(x) for x in v] if isinstance(v, list) else float(v) for k, v in axes.items()}
+        check_axes(axes)
+        if mode == 'goal_seek' or any(isinstance(v, list) for v in axes.values()):
+            return jsonify(simulation_grid(axes, mode, data.get('target')))
+        cost, monthly, years = axes["cost"], axes["monthly"], int(axes["years"])
+        base_trend, sim_trend = yearly_trend(cost, monthly, axes["rate"] / 100, years)
+    except (TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
     labels = [f"Year {i}" for i in range(1, years + 1)]
-    base_trend = []
-    sim_trend = []
-    
-    current_base = cost
-    current_sim = cost
-    
-    for _ in range(years):
-        current_base += (monthly * 12)
-        base_trend.append(round(current_base))
-        
-        investment = monthly * 12
-        current_sim = (current_sim + investment) * 1.12
-        sim_trend.append(round(current_sim))
-    
+
     diff = sim_trend[-1] - base_trend[-1]
-    advice = f"By investing ₹{int(monthly):,} monthly instead of just saving, you could create an additional wealth of ₹{int(diff):,} in 10 years. That's the power of compounding!"
+    if diff >= 0:
+        advice = f"By investing ₹{int(monthly):,} monthly instead of just saving, you could create an additional wealth of ₹{int(diff):,} in {years} years. That's the power of compounding!"
+    else:
+        advice = f"At a {axes['rate']:g}% return, investing ₹{int(monthly):,} monthly would leave you ₹{int(-diff):,} behind just saving after {years} years."
     
     return jsonify({
         "labels": labels,
@@ -112,18 +222,55 @@ def simulation_api():
         "advice": advice
     })
 
+def simulation_grid(axes, mode, target):
+    from services.simulation import grid, project, required_monthly, to_list
+    axes = {k: v if isinstance(v, list) else [v] for k, v in axes.items()}
+    if mode == 'goal_seek':
+        if target is None:
+            raise ValueError("goal_seek needs a target corpus")
+        target = float(target)
+        if not math.isfinite(target):
+            raise ValueError("target must be a finite number")
+        # Solve for the monthly amount, so it is not an axis of the result
+        axes.pop("monthly")
+        cost, _, rate, years = grid(dict(axes, monthly=[0]))
+        needed = required_monthly(target, cost, rate / 100, years)[:, 0]
+        return {
+            "status": "success",
+            "mode": "goal_seek",
+            "target": target,
+            "axes": axes,
+            "shape": list(needed.shape),
+            "monthly": to_list(needed, 2)
+        }
+
+    cost, monthly, rate, years = grid(axes)
+    saved, invested = project(cost, monthly, rate / 100, years)
+    return {
+        "status": "success",
+        "mode": "grid",
+        "axes": axes,
+        "shape": list(invested.shape),
+        "saved": to_list(saved),
+        "invested": to_list(invested)
+    }
+
 @api_bp.route('/budgets')
 @login_required
+@versioned
 def budgets_api():
+    period = request.args.get('period', 'month')
+    if period not in BUDGET_PERIODS:
+        return jsonify({"status": "error", "message": f"period must be one of {', '.join(BUDGET_PERIODS)}"}), 400
     return jsonify([{
         "id": b.id,
         "name": b.name,
         "limit": b.limit,
-        "spent": b.spent,
+        "spent": spent,
         "icon": b.icon,
         "color": b.color,
-        "transactions": Transaction.query.filter_by(user_id=current_user.id, category=b.name).count()
-    } for b in current_user.budgets])
+        "transactions": count
+    } for b, spent, count in budgets_with_spend(current_user.id, period)])
 
 @api_bp.route('/budgets', methods=['POST'])
 @login_required
@@ -141,7 +288,9 @@ def save_budget():
         budget.limit = float(data.get('limit', 0))
         budget.icon = data.get('icon', 'fas fa-wallet')
         budget.color = data.get('color', '#3B82F6')
+        reconcile_budget(budget)
         
+        bump_data_version(current_user.id)
         db.session.commit()
         return jsonify({"status": "success"})
     except Exception as e:
@@ -153,43 +302,112 @@ def delete_budget(budget_id):
     budget = Budget.query.filter_by(id=budget_id, user_id=current_user.id).first()
     if budget:
         db.session.delete(budget)
+        bump_data_version(current_user.id)
         db.session.commit()
         return jsonify({"status": "success"})
     return jsonify({"status": "error", "message": "Not found"}), 404
 
 @api_bp.route('/portfolio')
 @login_required
+@versioned
 def portfolio_api():
     plans = Portfolio.query.filter_by(user_id=current_user.id).all()
     return jsonify([{
         "id": p.id,
         "symbol": p.symbol,
         "company_name": p.company_name,
+        "quantity": p.quantity,
+        "avg_cost": p.avg_cost,
         "date": p.added_at.strftime('%Y-%m-%d')
     } for p in plans])
 
+def parse_holding(data, plan=None):
+    quantity = float(data.get('quantity', plan.quantity if plan else 0))
+    avg_cost = float(data.get('avg_cost', plan.avg_cost if plan else 0))
+    if quantity < 0 or avg_cost < 0:
+        raise ValueError("quantity and avg_cost must not be negative")
+    added_at = datetime.strptime(data['date'], '%Y-%m-%d') if data.get('date') else None
+    return quantity, avg_cost, added_at
+
+@api_bp.route('/portfolio/valuation')
+@login_required
+def portfolio_valuation_api():
+    from services.valuation import value_holdings
+    columns = (Portfolio.id, Portfolio.symbol, Portfolio.company_name, Portfolio.quantity, Portfolio.avg_cost, Portfolio.added_at)
+    holdings = [dict(r._mapping) for r in db.session.query(*columns).filter(Portfolio.user_id == current_user.id)]
+    # One batched lookup for every distinct symbol, whatever the number of holdings
+    quotes, failed, pending = read_quotes(sorted({h["symbol"] for h in holdings}))
+    valuation = value_holdings(holdings, quotes)
+    valuation.update(failed=failed, pending=pending)
+    return jsonify({"status": "success", "data": valuation})
+
+@api_bp.route('/portfolio/risk')
+@login_required
+def portfolio_risk_api():
+    from services.history import get_history_store
+    from services.risk import TRADING_DAYS, portfolio_risk
+    try:
+        days = min(max(int(request.args.get('days', TRADING_DAYS * 3)), 60), TRADING_DAYS * 10)
+    except ValueError:
+        return jsonify({"status": "error", "message": "days must be an integer"}), 400
+
+    holdings = {}
+    for symbol, quantity in db.session.query(Portfolio.symbol, Portfolio.quantity).filter(Portfolio.user_id == current_user.id):
+        holdings[symbol] = holdings.get(symbol, 0) + (quantity or 0)
+    if not holdings:
+        return jsonify({"status": "error", "message": "Portfolio is empty"}), 400
+    try:
+        report = portfolio_risk(get_history_store(current_app), holdings, days)
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 502
+    return jsonify({"status": "success", "data": report})
+
 @api_bp.route('/portfolio', methods=['POST'])
 @login_required
 def save_portfolio():
     data = request.get_json(silent=True) or {}
     try:
+        quantity, avg_cost, added_at = parse_holding(data)
+        # Store the master's canonical ticker (and name, if none given) when it knows the symbol
+        known = find_symbol(data['symbol'])
         new_plan = Portfolio(
             user_id=current_user.id,
-            symbol=data.get('symbol'),
-            company_name=data.get('company_name')
+            symbol=known["symbol"] if known else data.get('symbol'),
+            company_name=data.get('company_name') or (known["name"] if known else None),
+            quantity=quantity,
+            avg_cost=avg_cost,
+            added_at=added_at or datetime.utcnow()
         )
         db.session.add(new_plan)
+        bump_data_version(current_user.id)
         db.session.commit()
         return jsonify({"status": "success"})
     except Exception as e:
         return jsonify({"status": "error", "message": "Invalid portfolio data"}), 400
 
+@api_bp.route('/portfolio/<int:plan_id>', methods=['PUT'])
+@login_required
+def update_portfolio(plan_id):
+    plan = Portfolio.query.filter_by(id=plan_id, user_id=current_user.id).first()
+    if not plan:
+        return jsonify({"status": "error", "message": "Not found"}), 404
+    try:
+        plan.quantity, plan.avg_cost, added_at = parse_holding(request.get_json(silent=True) or {}, plan)
+    except (TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    if added_at:
+        plan.added_at = added_at
+    bump_data_version(current_user.id)
+    db.session.commit()
+    return jsonify({"status": "success"})
+
 @api_bp.route('/portfolio/<int:plan_id>', methods=['DELETE'])
 @login_required
 def delete_portfolio(plan_id):
     plan = Portfolio.query.filter_by(id=plan_id, user_id=current_user.id).first()
     if plan:
         db.session.delete(plan)
+        bump_data_version(current_user.id)
         db.session.commit()
         return jsonify({"status": "success"})
     return jsonify({"status": "error", "message": "Not found"}), 404
@@ -197,15 +415,24 @@ def delete_portfolio(plan_id):
 @api_bp.route('/invest/ai', methods=['POST'])
 @login_required
 def invest_ai_api():
+    # NumPy is only loaded by the endpoints that need it
+    from services.projection import expected_growth, simulate
     data = request.get_json(silent=True) or {}
-    amount = float(data.get('amount', 100000))
     risk = data.get('risk', 'medium')
-    age = int(data.get('age', 30))
     occupation = data.get('occupation', 'Professional')
     goal = data.get('goal', 'Wealth Accumulation')
-    
-    # Synthetic delay to mimic computational processing
-    time.sleep(1.5)
+    try:
+        amount = float(data.get('amount', 100000))
+        age = int(data.get('age', 30))
+        years = min(max(int(data.get('years', 10)), 1), 40)
+        monthly = float(data.get('monthly', 0))
+        # Without a target corpus the goal probability is measured against doubling the amount
+        target = float(data['target']) if data.get('target') else amount * 2
+        if not all(math.isfinite(x) and x >= 0 for x in (amount, monthly, target)):
+            raise ValueError
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "amount, age, years, monthly and target must be non-negative numbers"}), 400
+    target_source = "request" if data.get('target') else "default (2x amount)"
 
     stocks = crypto = real_estate = gold = fd = bonds = 0
 
@@ -233,17 +460,42 @@ def invest_ai_api():
         reasoning = f"Because your primary objective is {goal}, we have heavily defended this ₹{amount:,.0f} portfolio. As a {age}-year-old {occupation}, allocating {fd}% in government-backed Fixed Deposits and {bonds}% in stable sovereign bonds isolates you from severe market corrections."
 
     allocations = []
-    if stocks > 0: allocations.append({"label": "Stocks", "percent": stocks, "color": "#8B5CF6", "growth": 1.12})
-    if crypto > 0: allocations.append({"label": "Crypto/Alt", "percent": crypto, "color": "#EF4444", "growth": 1.25})
-    if real_estate > 0: allocations.append({"label": "Real Estate", "percent": real_estate, "color": "#EC4899", "growth": 1.09})
-    if gold > 0: allocations.append({"label": "Gold", "percent": gold, "color": "#F59E0B", "growth": 1.08})
-    if fd > 0: allocations.append({"label": "Fixed Deposits (FD)", "percent": fd, "color": "#3B82F6", "growth": 1.07})
-    if bonds > 0: allocations.append({"label": "Govt Bonds", "percent": bonds, "color": "#10B981", "growth": 1.06})
+    if stocks > 0: allocations.append({"label": "Stocks", "percent": stocks, "color": "#8B5CF6"})
+    if crypto > 0: allocations.append({"label": "Crypto/Alt", "percent": crypto, "color": "#EF4444"})
+    if real_estate > 0: allocations.append({"label": "Real Estate", "percent": real_estate, "color": "#EC4899"})
+    if gold > 0: allocations.append({"label": "Gold", "percent": gold, "color": "#F59E0B"})
+    if fd > 0: allocations.append({"label": "Fixed Deposits (FD)", "percent": fd, "color": "#3B82F6"})
+    if bonds > 0: allocations.append({"label": "Govt Bonds", "percent": bonds, "color": "#10B981"})
+    for a in allocations:
+        a["growth"] = expected_growth(a["label"])
+
+    weights = {a["label"]: a["percent"] for a in allocations}
+    if data.get('async'):
+        # Large path counts go to the job runner; poll /api/jobs/<id> for the projection
+        job = get_job_runner(current_app).submit(current_app._get_current_object(), current_user.id, 'projection', {
+            "weights": weights, "amount": amount, "years": years, "paths": data.get('paths', 10000),
+            "yearly_contribution": monthly * 12, "goal": target
+        })
+        return jsonify({
+            "status": "success",
+            "data": {
+                "allocation": allocations,
+                "reasoning": reasoning,
+                "target": target,
+                "target_source": target_source,
+                "job": serialize_job(job)
+            }
+        }), 202
+
+    projection = simulate(weights, amount, years=years, yearly_contribution=monthly * 12, goal=target)
 
     return jsonify({
         "status": "success",
         "data": {
             "allocation": allocations,
-            "reasoning": reasoning
+            "reasoning": reasoning,
+            "target": target,
+            "target_source": target_source,
+            "projection": projection
         }
     })
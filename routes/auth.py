@@ -2,6 +2,8 @@ from flask import Blueprint, request, session, redirect, url_for, flash, render_
 from flask_login import login_user, logout_user, login_required
 from werkzeug.security import generate_password_hash, check_password_hash
 from models import db, User, Transaction, Budget
+from services.identity import forget_user
+from services.ledger import rebuild_summary
 from datetime import datetime
 
 auth_bp = Blueprint('auth', __name__)
@@ -11,6 +13,8 @@ def seed_data(user_id):
     t1 = Transaction(user_id=user_id, description="Opening Balance", amount=50000.00, category="Income", date=datetime.now())
     t2 = Transaction(user_id=user_id, description="Netflix", amount=-650.00, category="Entertainment", date=datetime.now())
     db.session.add_all([t1, t2])
+    db.session.flush()
+    rebuild_summary(user_id)
     
     # Add dummy budgets
     b1 = Budget(user_id=user_id, name="Groceries", limit=15000, spent=8000, icon="fas fa-shopping-basket", color="#10B981")
@@ -62,6 +66,8 @@ def signup():
             )
             db.session.add(new_user)
             db.session.commit()
+            # SQLite can reuse a deleted user's id; don't serve that user's cached "not found"
+            forget_user(new_user.id)
             
             login_user(new_user)
             session['name'] = new_user.name
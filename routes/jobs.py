@@ -0,0 +1,33 @@
+from flask import Blueprint, current_app, request, jsonify
+from flask_login import login_required, current_user
+from services.jobs import get_job_runner, serialize_job
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('', methods=['POST'])
+@login_required
+def submit_job():
+    data = request.get_json(silent=True) or {}
+    try:
+        job = get_job_runner(current_app).submit(
+            current_app._get_current_object(), current_user.id, data.get('kind'), data.get('params') or {}
+        )
+    except (ValueError, TypeError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify({"status": "success", "data": serialize_job(job)}), 202
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    job = get_job_runner(current_app).get(current_user.id, job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "Not found"}), 404
+    return jsonify({"status": "success", "data": serialize_job(job)})
+
+@jobs_bp.route('/<job_id>', methods=['DELETE'])
+@login_required
+def cancel_job(job_id):
+    job = get_job_runner(current_app).cancel(current_user.id, job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "Not found"}), 404
+    return jsonify({"status": "success", "data": serialize_job(job)})
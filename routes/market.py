@@ -1,46 +1,46 @@
-from flask import Blueprint, request, jsonify
+import json
+import time
+import threading
+from flask import Blueprint, Response, current_app, request, jsonify
 from flask_login import login_required
-import yfinance as yf
-import feedparser
 from extensions import cache
+from services.guard import get_upstream_guard
+from services.history import get_history_store
+from services.news import get_news_aggregator
+from services.quotes import INDEX_TICKERS, quote_service
+from services.refresher import quote_refresher, read_quotes
+from services.sharedcache import cached_view
+from services.symbols import get_symbol_master
 
 market_bp = Blueprint('market', __name__)
 
+def index_rows(quotes, missing_as_zero=True):
+    data = []
+    for name, symbol in INDEX_TICKERS.items():
+        q = quotes.get(symbol)
+        if q is None and not missing_as_zero:
+            continue
+        data.append({
+            "name": name,
+            "price": round(q["price"], 2) if q else 0,
+            "change": round(q["change"], 2) if q else 0,
+            "symbol": symbol,
+            "stale": q["stale"] if q else True
+        })
+    return data
+
+def stock_rows(quotes):
+    return [{
+        "symbol": sym,
+        "price": round(q["price"], 2),
+        "change": round(q["change"], 2),
+        "stale": q["stale"]
+    } for sym, q in quotes.items()]
+
 @market_bp.route('/indices')
-@cache.cached(timeout=60) # Cache for 60 seconds to prevent rate limiting
 def get_market_indices():
-    # SENSEX (^BSESN), NIFTY 50 (^NSEI), BANK NIFTY (^NSEBANK), NASDAQ (^IXIC)
-    tickers = {
-        "SENSEX": "^BSESN",
-        "NIFTY 50": "^NSEI",
-        "BANK NIFTY": "^NSEBANK",
-        "NASDAQ": "^IXIC"
-    }
-    
-    data = []
-    for name, symbol in tickers.items():
-        try:
-            ticker = yf.Ticker(symbol)
-            price = ticker.fast_info.last_price
-            prev = ticker.fast_info.previous_close
-            change = price - prev
-            change_p = (change / prev) * 100
-            
-            data.append({
-                "name": name,
-                "price": round(price, 2),
-                "change": round(change_p, 2),
-                "symbol": symbol
-            })
-        except:
-            data.append({
-                "name": name,
-                "price": 0,
-                "change": 0,
-                "symbol": symbol
-            })
-            
-    return jsonify(data)
+    quotes, _, _ = read_quotes(list(INDEX_TICKERS.values()))
+    return jsonify(index_rows(quotes))
 
 @market_bp.route('/stocks', methods=['POST'])
 def get_stock_prices():
@@ -48,143 +48,111 @@ def get_stock_prices():
     symbols = req.get('symbols', [])
     
     if not symbols:
-        return jsonify([])
+        return jsonify({"quotes": [], "failed": [], "pending": []})
         
-    data = []
-    for sym in symbols:
-        try:
-            lookup_sym = sym if ('.' in sym or '^' in sym) else f"{sym}.NS"
-            
-            ticker = yf.Ticker(lookup_sym)
-            price = ticker.fast_info.last_price
-            prev = ticker.fast_info.previous_close
-            change = (price - prev) / prev * 100
-            
-            data.append({
-                "symbol": sym, 
-                "price": round(price, 2),
-                "change": round(change, 2)
-            })
-        except:
-            pass
-            
-    return jsonify(data)
+    quotes, failed, pending = read_quotes(symbols)
+    return jsonify({"quotes": stock_rows(quotes), "failed": failed, "pending": pending})
+
+_stream_lock = threading.Lock()
+_stream_count = 0
+
+def _release_stream_slot():
+    global _stream_count
+    with _stream_lock:
+        _stream_count -= 1
+
+@market_bp.route('/stream')
+def stream_market():
+    """Server-Sent Events feed of index and stock quotes that moved.
+
+    Clients subscribe with ?symbols=A,B,C. Each connection is closed after
+    STREAM_MAX_DURATION seconds and EventSource reconnects on its own, so a
+    worker thread is never pinned to one tab indefinitely.
+    """
+    global _stream_count
+    if not quote_refresher.running:
+        return jsonify({"error": "Live stream unavailable"}), 503
+
+    config = current_app.config
+    symbols = [s.strip() for s in request.args.get('symbols', '').split(',') if s.strip()][:200]
+    index_symbols = list(INDEX_TICKERS.values())
+    heartbeat = config['STREAM_HEARTBEAT']
+    deadline = time.time() + config['STREAM_MAX_DURATION']
+
+    def events():
+        version = 0
+        yield "retry: 5000\n\n"
+        while time.time() < deadline:
+            current = quote_service.version
+            indices = index_rows(quote_service.changed_since(index_symbols, version), missing_as_zero=False)
+            stocks = stock_rows(quote_service.changed_since(symbols, version))
+            version = current
+
+            if indices or stocks:
+                yield f"event: quotes\ndata: {json.dumps({'indices': indices, 'stocks': stocks})}\n\n"
+            else:
+                yield ": heartbeat\n\n"
+
+            # Re-register on every cycle so the refresher keeps this connection's symbols warm
+            quote_refresher.watch(symbols)
+            quote_service.wait_for_change(version, heartbeat)
+
+    with _stream_lock:
+        if _stream_count >= config['STREAM_MAX_CONNECTIONS']:
+            return jsonify({"error": "Too many live connections"}), 503
+        _stream_count += 1
+    resp = Response(events(), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+    # The server closes the response whether or not the body was ever iterated
+    resp.call_on_close(_release_stream_slot)
+    return resp
+
+@market_bp.route('/search')
+def search_symbols():
+    # Autocomplete over the local symbol master: ?q=reli or ?q=tata motors
+    q = request.args.get('q', '')
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    return jsonify(get_symbol_master(current_app).search(q, limit) if q.strip() else [])
+
+@market_bp.route('/quotes/status')
+@login_required
+def get_quote_status():
+    status = quote_refresher.status()
+    if current_app.config['UPSTREAM_GUARD_ENABLED']:
+        status["upstream"] = {name: get_upstream_guard(current_app, name).status() for name in ('yahoo', 'news')}
+    return jsonify(status)
 
 @market_bp.route('/history/<path:symbol>')
 @login_required
-@cache.cached(timeout=3600, key_prefix=lambda: f"hist_{request.path}") # Cache history for 1 hour
 def get_stock_history(symbol):
+    # Optional ?start=YYYY-MM-DD&end=YYYY-MM-DD&points=N for zoomed views
+    start = request.args.get('start') or None
+    end = request.args.get('end') or None
     try:
-        ticker = yf.Ticker(symbol)
-        hist = ticker.history(period="max")
-        
-        total_points = len(hist)
-        step = max(1, total_points // 500)
-        
-        subset = hist.iloc[::step]
+        points = min(max(int(request.args.get('points', 500)), 10), 5000)
+    except ValueError:
+        return jsonify({"error": "points must be an integer"}), 400
+
+    try:
+        store = get_history_store(current_app)
+        pyramid = store.pyramid(symbol)
+        dates, closes = pyramid.query(start, end, points)
         
         chart_data = {
-            "labels": subset.index.strftime('%Y-%m-%d').tolist(),
-            "data": subset['Close'].round(2).tolist()
+            "labels": dates.astype(str).tolist(),
+            "data": closes.round(2).tolist(),
+            "stale": symbol in store.stale
         }
         return jsonify(chart_data)
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 @market_bp.route('/news')
-@cache.cached(timeout=600)  # Cache for 10 minutes
+@cached_view(cache, timeout=60) # One worker rebuilds the merged list per minute; the rest read it
 def get_market_news():
-    import re
-    import email.utils
-
-    # Indian financial news RSS feeds — fast, reliable, updated throughout the trading day
-    feeds = [
-        {
-            "url": "https://economictimes.indiatimes.com/markets/rss.cms",
-            "source": "Economic Times",
-            "type": "Markets",
-            "color": "blue"
-        },
-        {
-            "url": "https://www.moneycontrol.com/rss/MCtopnews.xml",
-            "source": "MoneyControl",
-            "type": "Top News",
-            "color": "green"
-        },
-        {
-            "url": "https://feeds.feedburner.com/ndtvnews-business",
-            "source": "NDTV Business",
-            "type": "Business",
-            "color": "red"
-        },
-        {
-            "url": "https://www.livemint.com/rss/markets",
-            "source": "LiveMint",
-            "type": "Markets",
-            "color": "purple"
-        }
-    ]
-
-    # Spoof a browser User-Agent to prevent 403 Forbidden responses from feed servers
-    ua_headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/122.0.0.0 Safari/537.36"
-        )
-    }
-
-    news_items = []
-
-    for feed in feeds:
-        try:
-            parsed = feedparser.parse(feed["url"], request_headers=ua_headers)
-
-            if parsed.bozo and not parsed.entries:
-                print(f"Feed bozo error for {feed['source']}: {parsed.bozo_exception}")
-                continue
-
-            for entry in parsed.entries[:6]:
-                summary = ""
-                if hasattr(entry, 'summary'):
-                    summary = re.sub(r'<[^>]+>', '', entry.summary).strip()
-                    if len(summary) > 180:
-                        summary = summary[:177] + "..."
-                elif hasattr(entry, 'description'):
-                    summary = re.sub(r'<[^>]+>', '', entry.description).strip()
-                    if len(summary) > 180:
-                        summary = summary[:177] + "..."
-
-                # Skip entries with no real content
-                if not entry.get('title', '').strip():
-                    continue
-
-                news_items.append({
-                    "title": entry.title.strip(),
-                    "link": entry.get('link', '#'),
-                    "published": entry.get('published', entry.get('updated', '')),
-                    "source": feed["source"],
-                    "type": feed["type"],
-                    "color": feed["color"],
-                    "summary": summary
-                })
-        except Exception as e:
-            print(f"Error parsing feed {feed['source']} ({feed['url']}): {e}")
-            # Continue processing remaining feeds even if one fails
-            continue
-
-    def parse_pub_date(date_str):
-        if not date_str:
-            return 0
-        try:
-            parsed_date = email.utils.parsedate_tz(date_str)
-            if parsed_date:
-                return email.utils.mktime_tz(parsed_date)
-            return 0
-        except Exception:
-            return 0
-
-    # Sort newest first across all feeds
-    news_items.sort(key=lambda x: parse_pub_date(x['published']), reverse=True)
-
-    return jsonify(news_items[:16])  # Return top 16 combined
+    return jsonify(get_news_aggregator(current_app).get_items(16))  # Return top 16 combined
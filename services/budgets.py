@@ -0,0 +1,81 @@
+from datetime import datetime
+from sqlalchemy import case, func
+from models import db, Budget, Transaction
+
+PERIODS = ('month', 'year', 'all')
+
+
+def period_bounds(period='month', now=None):
+    """[start, end) datetimes for the budget period containing `now`; (None, None) for all time."""
+    now = now or datetime.now()
+    if period == 'all':
+        return None, None
+    if period == 'year':
+        return datetime(now.year, 1, 1), datetime(now.year + 1, 1, 1)
+    start = datetime(now.year, now.month, 1)
+    end = datetime(now.year + (now.month == 12), now.month % 12 + 1, 1)
+    return start, end
+
+
+def spend_query(user_id, categories, start=None, end=None):
+    query = db.session.query(
+        Transaction.category,
+        func.coalesce(func.sum(case((Transaction.amount < 0, -Transaction.amount), else_=0)), 0),
+        func.count(Transaction.id)
+    ).filter(Transaction.user_id == user_id, Transaction.category.in_(categories))
+    if start is not None:
+        query = query.filter(Transaction.date >= start, Transaction.date < end)
+    return query.group_by(Transaction.category)
+
+
+def category_spend(user_id, categories, start=None, end=None):
+    """{category: (spent, transaction count)} for all categories in one grouped query."""
+    if not categories:
+        return {}
+    query = spend_query(user_id, categories, start, end)
+    return {cat: (float(spent), count) for cat, spent, count in query}
+
+
+def budgets_with_spend(user_id, period='month'):
+    """The user's budgets with spend and count for the period, computed from the ledger (read-only).
+
+    The stored `spent` is not used here, so a read never has to write back a
+    period rollover; write paths keep it current instead.
+    """
+    budgets = Budget.query.filter_by(user_id=user_id).all()
+    start, end = period_bounds(period)
+    spend = category_spend(user_id, {b.name for b in budgets}, start, end)
+    return [(b, *spend.get(b.name, (0.0, 0))) for b in budgets]
+
+
+def reconcile(budget):
+    """Recompute a new or renamed budget's stored monthly `spent` from the ledger (no commit)."""
+    start, end = period_bounds('month')
+    budget.spent = category_spend(budget.user_id, {budget.name}, start, end).get(budget.name, (0.0, 0))[0]
+
+
+def record_rows(user_id, rows):
+    """record_transaction() for a batch of new rows (dicts): one UPDATE per budget touched (no commit)."""
+    start, end = period_bounds('month')
+    spend = {}
+    for r in rows:
+        if r["amount"] < 0 and start <= r["date"] < end:
+            spend[r["category"]] = spend.get(r["category"], 0.0) - r["amount"]
+    for category, amount in spend.items():
+        Budget.query.filter_by(user_id=user_id, name=category).update(
+            {Budget.spent: func.coalesce(Budget.spent, 0) + amount},
+            synchronize_session=False
+        )
+
+
+def record_transaction(tx, sign=1):
+    """Adjust the stored monthly `spent` of the budget matching tx.category (no commit)."""
+    if tx.amount >= 0:
+        return
+    start, end = period_bounds('month')
+    if not (start <= tx.date < end):
+        return
+    Budget.query.filter_by(user_id=tx.user_id, name=tx.category).update(
+        {Budget.spent: func.coalesce(Budget.spent, 0) + sign * -tx.amount},
+        synchronize_session=False
+    )
@@ -0,0 +1,72 @@
+import numpy as np
+
+
+def minmax_indices(values, points):
+    """Indices of a shape-preserving subset of `values` of at most ~`points` entries.
+
+    The series is cut into equal buckets and each bucket keeps both its lowest
+    and highest sample, so peaks and crashes survive where a fixed stride would
+    step over them. The first and last samples are always kept.
+    """
+    n = len(values)
+    if n <= points:
+        return np.arange(n)
+
+    buckets = max(1, (points - 2) // 2)
+    size = -(-n // buckets)
+    buckets = -(-n // size)
+
+    grid = np.full(buckets * size, np.nan)
+    grid[:n] = values
+    grid = grid.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+
+    lows = np.nanargmin(grid, axis=1) + offsets
+    highs = np.nanargmax(grid, axis=1) + offsets
+    return np.unique(np.concatenate(([0], lows, highs, [n - 1])))
+
+
+class HistoryPyramid:
+    """Multi-resolution view of one symbol's close series.
+
+    Level 0 is every bar; each coarser level keeps the min/max of buckets of
+    FACTOR samples from the level below (roughly a 4x reduction). A range query
+    starts from the coarsest level that still has enough samples inside the
+    range, so zoomed-out views never touch the full series.
+    """
+
+    FACTOR = 8
+    MIN_LEVEL_SIZE = 256
+
+    def __init__(self, dates, closes):
+        self.dates = np.asarray(dates, dtype='datetime64[D]')
+        self.closes = np.asarray(closes, dtype=float)
+        self.levels = [np.arange(len(self.closes))]
+        while len(self.levels[-1]) > self.MIN_LEVEL_SIZE:
+            prev = self.levels[-1]
+            keep = minmax_indices(self.closes[prev], 2 * len(prev) // self.FACTOR + 2)
+            if len(keep) >= len(prev):
+                break
+            self.levels.append(prev[keep])
+
+    @property
+    def last_date(self):
+        return str(self.dates[-1]) if len(self.dates) else None
+
+    @property
+    def last_bar(self):
+        return (self.last_date, float(self.closes[-1])) if len(self.dates) else (None, None)
+
+    def query(self, start=None, end=None, points=500):
+        """Return (dates, closes) arrays for [start, end] reduced to about `points` samples."""
+        lo = np.searchsorted(self.dates, np.datetime64(start, 'D'), 'left') if start else 0
+        hi = np.searchsorted(self.dates, np.datetime64(end, 'D'), 'right') if end else len(self.dates)
+
+        for level in reversed(self.levels):
+            a, b = np.searchsorted(level, [lo, hi])
+            if b - a >= points or level is self.levels[0]:
+                break
+
+        selected = level[a:b]
+        selected = selected[minmax_indices(self.closes[selected], points)]
+        return self.dates[selected], self.closes[selected]
@@ -0,0 +1,170 @@
+import os
+import math
+import time
+import sqlite3
+import threading
+
+# Provider error reasons with this prefix mean the symbol itself is bad (invalid, delisted)
+UNKNOWN_SYMBOL = "unknown symbol"
+
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling upstream while its circuit is open or the rate limit is spent."""
+
+
+class UpstreamGuard:
+    """Rate limiter, circuit breaker and negative cache for one upstream service.
+
+    State lives in a SQLite file so every worker on the host shares it: the
+    token bucket caps the combined request rate, a breaker opened by one
+    worker stops all of them, and a symbol found invalid by one is skipped
+    by all until `negative_ttl` passes.
+
+    Breakers are kept per `scope` (e.g. one per feed) and open after
+    `failure_threshold` consecutive failures. After `reset_timeout` a single
+    caller is let through as a trial; its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, path, name, rate=5.0, burst=20, failure_threshold=5, reset_timeout=60, negative_ttl=3600):
+        self.path = path
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.negative_ttl = negative_ttl
+        self._local = threading.local()
+        self._schema_ready = False
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        if not self._schema_ready:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS buckets (
+                    name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS breakers (
+                    name TEXT PRIMARY KEY, failures INTEGER NOT NULL, opened_until REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS negative (
+                    name TEXT NOT NULL, key TEXT NOT NULL, until REAL NOT NULL, reason TEXT,
+                    PRIMARY KEY (name, key)
+                );
+            """)
+            self._schema_ready = True
+        return conn
+
+    def _breaker(self, scope):
+        return f"{self.name}:{scope}" if scope else self.name
+
+    # Token bucket
+
+    def acquire(self, n=1):
+        """Take up to `n` tokens without waiting; returns how many were granted."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)).fetchone()
+            tokens = self.burst if row is None else min(self.burst, row[0] + (now - row[1]) * self.rate)
+            granted = min(n, math.floor(tokens))
+            conn.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                         (self.name, tokens - granted, now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return granted
+
+    # Circuit breaker
+
+    def allow(self, scope=None):
+        name = self._breaker(scope)
+        conn = self._conn()
+        row = conn.execute("SELECT opened_until FROM breakers WHERE name = ?", (name,)).fetchone()
+        if row is None or row[0] == 0:
+            return True
+        now = time.time()
+        if now < row[0]:
+            return False
+        # Half-open: whoever pushes opened_until forward gets the single trial call
+        cur = conn.execute("UPDATE breakers SET opened_until = ? WHERE name = ? AND opened_until = ?",
+                           (now + self.reset_timeout, name, row[0]))
+        return cur.rowcount == 1
+
+    def success(self, scope=None):
+        self._conn().execute("UPDATE breakers SET failures = 0, opened_until = 0 WHERE name = ?",
+                             (self._breaker(scope),))
+
+    def failure(self, scope=None):
+        self._conn().execute(
+            "INSERT INTO breakers (name, failures, opened_until) VALUES (?1, 1, CASE WHEN 1 >= ?2 THEN ?3 ELSE 0 END) "
+            "ON CONFLICT (name) DO UPDATE SET failures = failures + 1, "
+            "opened_until = CASE WHEN failures + 1 >= ?2 THEN ?3 ELSE opened_until END",
+            (self._breaker(scope), self.failure_threshold, time.time() + self.reset_timeout)
+        )
+
+    def is_open(self, scope=None):
+        row = self._conn().execute("SELECT opened_until FROM breakers WHERE name = ?",
+                                   (self._breaker(scope),)).fetchone()
+        return row is not None and row[0] > time.time()
+
+    def check(self, scope=None):
+        """Raise UpstreamUnavailable unless a single call may go upstream now."""
+        if not self.allow(scope):
+            raise UpstreamUnavailable(f"{self._breaker(scope)} circuit open")
+        if not self.acquire():
+            raise UpstreamUnavailable(f"{self.name} rate limited")
+
+    # Negative cache
+
+    def negative(self, keys):
+        """Return {key: reason} for the keys currently known to be invalid."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        rows = self._conn().execute(
+            f"SELECT key, reason FROM negative WHERE name = ? AND until > ? AND key IN ({','.join('?' * len(keys))})",
+            [self.name, time.time()] + keys
+        ).fetchall()
+        return dict(rows)
+
+    def mark_negative(self, reasons):
+        until = time.time() + self.negative_ttl
+        self._conn().executemany(
+            "INSERT OR REPLACE INTO negative (name, key, until, reason) VALUES (?, ?, ?, ?)",
+            [(self.name, key, until, reason) for key, reason in reasons.items()]
+        )
+
+    def status(self):
+        conn = self._conn()
+        rows = conn.execute("SELECT name, failures, opened_until FROM breakers WHERE name = ? OR name LIKE ?",
+                            (self.name, self.name + ':%'))
+        return {
+            "breakers": {name: {"failures": failures, "open": opened_until > time.time()}
+                         for name, failures, opened_until in rows},
+            "negative": conn.execute("SELECT COUNT(*) FROM negative WHERE name = ? AND until > ?",
+                                     (self.name, time.time())).fetchone()[0]
+        }
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def get_upstream_guard(app, name):
+    with _guards_lock:
+        if name not in _guards:
+            _guards[name] = UpstreamGuard(
+                app.config['UPSTREAM_GUARD_PATH'], name,
+                rate=app.config['UPSTREAM_RATE'],
+                burst=app.config['UPSTREAM_BURST'],
+                failure_threshold=app.config['UPSTREAM_FAILURE_THRESHOLD'],
+                reset_timeout=app.config['UPSTREAM_RESET_TIMEOUT'],
+                negative_ttl=app.config['NEGATIVE_CACHE_TTL']
+            )
+        return _guards[name]
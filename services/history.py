@@ -0,0 +1,258 @@
+import os
+import time
+import sqlite3
+import threading
+from datetime import date, timedelta
+from services.guard import UNKNOWN_SYMBOL, get_upstream_guard
+from services.metrics import upstream_call
+
+
+class HistoryProvider:
+    """Interface for daily price history sources.
+
+    fetch(symbol, start) returns a list of (date 'YYYY-MM-DD', open, high, low,
+    close, volume) tuples, oldest first. start=None means the full history.
+    """
+
+    def fetch(self, symbol, start=None):
+        raise NotImplementedError
+
+
+class YFinanceHistoryProvider(HistoryProvider):
+    def fetch(self, symbol, start=None):
+        import yfinance as yf
+        ticker = yf.Ticker(symbol)
+        with upstream_call("yahoo", "history"):
+            hist = ticker.history(period="max") if start is None else ticker.history(start=start)
+        hist = hist.dropna(subset=['Close'])
+        if hist.empty:
+            return []
+        dates = hist.index.strftime('%Y-%m-%d')
+        return list(zip(
+            dates,
+            hist['Open'].astype(float), hist['High'].astype(float), hist['Low'].astype(float),
+            hist['Close'].astype(float), hist['Volume'].astype(float)
+        ))
+
+
+class StaticHistoryProvider(HistoryProvider):
+    """Deterministic offline provider: a seeded random walk of weekday bars up to today."""
+
+    def __init__(self, years=20, latency=0.0):
+        self.years = years
+        self.latency = latency
+        self.calls = []
+
+    def fetch(self, symbol, start=None):
+        import numpy as np
+        self.calls.append((symbol, start))
+        if self.latency:
+            time.sleep(self.latency)
+
+        end = date.today()
+        first = end - timedelta(days=365 * self.years)
+        days = np.arange(np.datetime64(first), np.datetime64(end) + 1)
+        days = days[np.is_busday(days)]
+        rng = np.random.default_rng(sum(map(ord, symbol)))
+        closes = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.012, len(days))))
+
+        labels = days.astype(str)
+        keep = labels >= start if start else slice(None)
+        return [
+            (d, c, c * 1.01, c * 0.99, c, 1e6)
+            for d, c in zip(labels[keep].tolist(), closes[keep].tolist())
+        ]
+
+
+class GuardedHistoryProvider(HistoryProvider):
+    """Routes history fetches through an UpstreamGuard (see GuardedQuoteProvider)."""
+
+    def __init__(self, provider, guard):
+        self.provider = provider
+        self.guard = guard
+
+    def fetch(self, symbol, start=None):
+        known_bad = self.guard.negative([symbol])
+        if known_bad:
+            raise LookupError(known_bad[symbol])
+        self.guard.check()
+        try:
+            bars = self.provider.fetch(symbol, start)
+        except Exception:
+            self.guard.failure()
+            raise
+        self.guard.success()
+        if not bars and start is None:
+            # No history at all: invalid or delisted
+            self.guard.mark_negative({symbol: f"{UNKNOWN_SYMBOL}: no price history"})
+            raise LookupError(f"{UNKNOWN_SYMBOL}: no price history")
+        return bars
+
+
+class HistoryStore:
+    """Persistent per-symbol daily bars in a SQLite file shared by all workers.
+
+    The first read of a symbol downloads its full history; afterwards a refresh
+    (at most every `refresh_interval` seconds) only asks the provider for bars
+    from the last stored date onward. The last bar is re-fetched because it may
+    have been written mid-session.
+    """
+
+    def __init__(self, path, provider=None, refresh_interval=3600):
+        self.path = path
+        self.provider = provider or YFinanceHistoryProvider()
+        self.refresh_interval = refresh_interval
+        self._local = threading.local()
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._schema_ready = False
+        self._pyramids = {}
+        # Symbols whose last refresh attempt in this process failed
+        self.stale = set()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        if not self._schema_ready:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS bars (
+                    symbol TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    open REAL, high REAL, low REAL, close REAL, volume REAL,
+                    PRIMARY KEY (symbol, date)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS history_meta (
+                    symbol TEXT PRIMARY KEY,
+                    last_checked REAL NOT NULL
+                );
+            """)
+            self._schema_ready = True
+        return conn
+
+    def _symbol_lock(self, symbol):
+        with self._locks_guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def last_date(self, symbol):
+        row = self._conn().execute("SELECT MAX(date) FROM bars WHERE symbol = ?", (symbol,)).fetchone()
+        return row[0]
+
+    def last_bar(self, symbol):
+        """(date, close) of the newest stored bar, or (None, None)."""
+        row = self._conn().execute(
+            "SELECT date, close FROM bars WHERE symbol = ? ORDER BY date DESC LIMIT 1", (symbol,)
+        ).fetchone()
+        return tuple(row) if row else (None, None)
+
+    def _claim_refresh(self, symbol):
+        # Atomically bump last_checked so only one worker process refreshes a stale symbol.
+        # Returns the claim's timestamp, or None when the symbol is fresh or claimed elsewhere.
+        conn = self._conn()
+        now = time.time()
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO history_meta (symbol, last_checked) VALUES (?, 0)", (symbol,))
+            cur = conn.execute(
+                "UPDATE history_meta SET last_checked = ? WHERE symbol = ? AND last_checked < ?",
+                (now, symbol, now - self.refresh_interval)
+            )
+        return now if cur.rowcount == 1 else None
+
+    def _release_claim(self, symbol, claimed):
+        # The fetch failed: let the next reader retry instead of waiting out refresh_interval
+        conn = self._conn()
+        with conn:
+            conn.execute("UPDATE history_meta SET last_checked = 0 WHERE symbol = ? AND last_checked = ?",
+                         (symbol, claimed))
+
+    def refresh(self, symbol, force=False):
+        """Append bars newer than the last stored one. Returns the number of bars written."""
+        with self._symbol_lock(symbol):
+            last = self.last_date(symbol)
+            claimed = None
+            if last is not None and not force:
+                claimed = self._claim_refresh(symbol)
+                if claimed is None:
+                    return 0
+
+            try:
+                bars = self.provider.fetch(symbol, start=last)
+            except Exception:
+                if claimed is not None:
+                    self._release_claim(symbol, claimed)
+                raise
+            conn = self._conn()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO bars (symbol, date, open, high, low, close, volume) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(symbol,) + tuple(b) for b in bars]
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO history_meta (symbol, last_checked) VALUES (?, ?)",
+                    (symbol, time.time())
+                )
+            return len(bars)
+
+    def _refresh_or_serve_stale(self, symbol):
+        try:
+            self.refresh(symbol)
+            self.stale.discard(symbol)
+        except Exception:
+            # A failed incremental update still leaves the stored series servable
+            if self.last_date(symbol) is None:
+                raise
+            self.stale.add(symbol)
+
+    def current_date(self, symbol):
+        """Refresh the symbol if stale and return the date of its newest stored bar."""
+        self._refresh_or_serve_stale(symbol)
+        return self.last_date(symbol)
+
+    def closes(self, symbol, start=None, end=None, refresh=True):
+        """Return (dates, closes) lists for the symbol, oldest first, refreshing it if stale."""
+        if refresh:
+            self._refresh_or_serve_stale(symbol)
+        sql = "SELECT date, close FROM bars WHERE symbol = ?"
+        args = [symbol]
+        if start:
+            sql += " AND date >= ?"
+            args.append(start)
+        if end:
+            sql += " AND date <= ?"
+            args.append(end)
+        rows = self._conn().execute(sql + " ORDER BY date", args).fetchall()
+        return [r[0] for r in rows], [r[1] for r in rows]
+
+    def pyramid(self, symbol):
+        """Return the symbol's HistoryPyramid, rebuilt only when the stored bars have changed."""
+        from services.downsample import HistoryPyramid
+        # Another worker may have appended bars, so compare against the store, not our own refresh.
+        # A refresh rewrites the last bar mid-session, so its close counts as well as its date.
+        self._refresh_or_serve_stale(symbol)
+        last = self.last_bar(symbol)
+        cached = self._pyramids.get(symbol)
+        if cached is None or cached.last_bar != last:
+            dates, closes = self.closes(symbol, refresh=False)
+            cached = self._pyramids[symbol] = HistoryPyramid(dates, closes)
+        return cached
+
+
+history_store = None
+
+
+def get_history_store(app):
+    global history_store
+    if history_store is None:
+        provider = YFinanceHistoryProvider()
+        if app.config['UPSTREAM_GUARD_ENABLED']:
+            provider = GuardedHistoryProvider(provider, get_upstream_guard(app, 'yahoo'))
+        history_store = HistoryStore(
+            app.config['HISTORY_DB_PATH'],
+            provider=provider,
+            refresh_interval=app.config['HISTORY_REFRESH_INTERVAL']
+        )
+    return history_store
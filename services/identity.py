@@ -0,0 +1,77 @@
+from flask import current_app
+from flask_login import UserMixin
+from sqlalchemy import event
+from extensions import cache
+from models import db, User
+
+# Columns cached for `current_user`; the password hash is never cached
+PRINCIPAL_FIELDS = ('id', 'email', 'name')
+# Columns that change with the user's data: read from the database once per request, on first use
+LIVE_FIELDS = ('initial_balance',)
+_PENDING = 'identity_invalidate'
+
+
+class Principal(UserMixin):
+    """The logged-in user as seen by views: identity columns only, not bound to a session.
+
+    LIVE_FIELDS are not cached, since a cached copy could outlive the write that
+    changed them; the first access loads them in one query. Views that need to
+    change the user row load it with db.session.get(User, current_user.id).
+    """
+
+    def __init__(self, fields):
+        for name in PRINCIPAL_FIELDS:
+            setattr(self, name, fields[name])
+
+    def __getattr__(self, name):
+        if name not in LIVE_FIELDS:
+            raise AttributeError(name)
+        columns = [getattr(User, field) for field in LIVE_FIELDS]
+        row = db.session.query(*columns).filter(User.id == self.id).one()
+        self.__dict__.update(row._mapping)
+        return self.__dict__[name]
+
+    def __repr__(self):
+        return f"<Principal {self.id}>"
+
+
+def _key(user_id):
+    return f"identity:{int(user_id)}"
+
+
+def load_principal(user_id):
+    """flask-login user_loader: the user's principal from the shared cache, or None for unknown ids.
+
+    Misses read the identity columns in one query and cache them (unknown ids
+    too) for USER_CACHE_TTL seconds. USER_CACHE_TTL = 0 disables the cache.
+    """
+    ttl = current_app.config['USER_CACHE_TTL']
+    fields = cache.get(_key(user_id)) if ttl else None
+    if fields is None:
+        columns = [getattr(User, name) for name in PRINCIPAL_FIELDS]
+        row = db.session.query(*columns).filter(User.id == int(user_id)).first()
+        fields = dict(row._mapping) if row else {}
+        if ttl:
+            cache.set(_key(user_id), fields, timeout=ttl)
+    return Principal(fields) if fields else None
+
+
+def forget_user(user_id):
+    """Drop the cached principal now."""
+    cache.delete(_key(user_id))
+
+
+def invalidate_user(user_id):
+    """Drop the cached principal once the current transaction commits.
+
+    Deleting before the commit would let a concurrent request re-cache the old
+    row. After a rollback the extra delete on the next commit is harmless.
+    """
+    db.session.info.setdefault(_PENDING, set()).add(int(user_id))
+
+
+@event.listens_for(db.session, 'after_commit')
+def _forget_committed(session):
+    for user_id in session.info.pop(_PENDING, ()):
+        forget_user(user_id)
+
@@ -0,0 +1,295 @@
+import os
+import json
+import time
+import uuid
+import socket
+import hashlib
+import threading
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from models import db, Job
+from services.guard import UpstreamGuard, get_upstream_guard
+
+
+# Job kinds: name -> (prepare, run). prepare() validates user-supplied params
+# inside the web process and may add server-side ones; run() executes in a pool
+# process, so it must be a picklable top-level function that touches no Flask
+# state and returns something JSON-serialisable.
+def _prepare_projection(params, app):
+    from services.projection import ASSET_CLASSES
+    weights = {k: float(v) for k, v in dict(params.get('weights', {})).items()}
+    if not weights or set(weights) - set(ASSET_CLASSES) or sum(weights.values()) <= 0:
+        raise ValueError(f"weights must map some of {', '.join(ASSET_CLASSES)} to positive numbers")
+    goal = params.get('goal')
+    return {
+        "weights": weights,
+        "amount": float(params.get('amount', 100000)),
+        "years": min(max(int(params.get('years', 10)), 1), 40),
+        "paths": min(max(int(params.get('paths', 10000)), 100), 200000),
+        "yearly_contribution": float(params.get('yearly_contribution', 0)),
+        "goal": None if goal is None else float(goal),
+        "seed": None if params.get('seed') is None else int(params['seed'])
+    }
+
+
+def _run_projection(params):
+    from services.projection import simulate
+    return simulate(**params)
+
+
+def _prepare_history_refresh(params, app):
+    symbols = params.get('symbols')
+    if not isinstance(symbols, list) or not symbols or len(symbols) > 100:
+        raise ValueError("symbols must be a list of 1-100 Yahoo symbols")
+    guard = None
+    if app.config['UPSTREAM_GUARD_ENABLED']:
+        g = get_upstream_guard(app, 'yahoo')
+        guard = {"path": g.path, "rate": g.rate, "burst": g.burst, "failure_threshold": g.failure_threshold,
+                 "reset_timeout": g.reset_timeout, "negative_ttl": g.negative_ttl}
+    return {
+        "symbols": sorted({str(s) for s in symbols}),
+        "path": app.config['HISTORY_DB_PATH'],
+        "refresh_interval": app.config['HISTORY_REFRESH_INTERVAL'],
+        "guard": guard
+    }
+
+
+def _run_history_refresh(params):
+    from services.history import GuardedHistoryProvider, HistoryStore, YFinanceHistoryProvider
+    provider = YFinanceHistoryProvider()
+    if params["guard"]:
+        # Same shared limiter/breaker state as the web workers
+        provider = GuardedHistoryProvider(provider, UpstreamGuard(name='yahoo', **params["guard"]))
+    store = HistoryStore(params["path"], provider=provider, refresh_interval=params["refresh_interval"])
+    written = {}
+    for symbol in params["symbols"]:
+        try:
+            written[symbol] = store.refresh(symbol)
+        except Exception as e:
+            written[symbol] = f"error: {e}"
+    return {"bars_written": written}
+
+
+JOB_KINDS = {
+    "projection": (_prepare_projection, _run_projection),
+    "history_refresh": (_prepare_history_refresh, _run_history_refresh),
+}
+
+FINISHED = ('done', 'failed', 'cancelled')
+
+
+def _execute(kind, params):
+    return JOB_KINDS[kind][1](params)
+
+
+def input_hash(kind, params):
+    return hashlib.sha256(f"{kind}:{json.dumps(params, sort_keys=True)}".encode()).hexdigest()
+
+
+def _owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_exited(owner):
+    """True when `owner` is a worker on this host that no longer runs; other hosts can't be checked."""
+    host, _, pid = (owner or '').rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def serialize_job(job):
+    data = {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+    if job.status == 'done':
+        data["result"] = json.loads(job.result)
+    if job.error:
+        data["error"] = job.error
+    return data
+
+
+class JobRunner:
+    """Runs registered job kinds on a local process pool, tracking them in the Job table.
+
+    No broker is involved: the web process that accepts a job submits it to
+    its own pool and records the outcome when the future completes. Because
+    state lives in the database, any worker can answer a poll or a cancel.
+    A finished job's result is reused for identical input (same kind and
+    params) for `result_ttl` seconds.
+
+    The accepting worker records itself as the job's owner and refreshes the
+    job's heartbeat every `heartbeat_interval` seconds while it runs. A poll
+    reports the job lost when its owner on this host has exited or its
+    heartbeat is older than `lost_after`.
+    """
+
+    def __init__(self, max_workers=2, result_ttl=3600, lost_after=120, heartbeat_interval=15):
+        self.max_workers = max_workers
+        self.result_ttl = result_ttl
+        self.lost_after = lost_after
+        self.heartbeat_interval = heartbeat_interval
+        self._pool = None
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._heartbeat_pid = None
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: forking a threaded gunicorn worker could copy held locks into the child
+                self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def submit(self, app, user_id, kind, params):
+        if kind not in JOB_KINDS:
+            raise ValueError(f"unknown job kind '{kind}'")
+        params = JOB_KINDS[kind][0](params, app)
+        digest = input_hash(kind, params)
+
+        # Same request still in flight for this user: hand back that job
+        running = Job.query.filter(Job.user_id == user_id, Job.input_hash == digest,
+                                   Job.status.in_(('queued', 'running'))).first()
+        if running:
+            return running
+
+        job = Job(id=uuid.uuid4().hex, user_id=user_id, kind=kind, input_hash=digest, params=json.dumps(params))
+        cached = Job.query.filter(
+            Job.input_hash == digest, Job.status == 'done',
+            Job.finished_at >= datetime.utcnow() - timedelta(seconds=self.result_ttl)
+        ).order_by(Job.finished_at.desc()).first()
+        if cached:
+            job.status, job.result, job.finished_at = 'done', cached.result, datetime.utcnow()
+            db.session.add(job)
+            db.session.commit()
+            return job
+
+        # 'running' is committed before submitting: from then on only _finish (or cancel) writes the status
+        job.status, job.owner, job.heartbeat_at = 'running', _owner(), datetime.utcnow()
+        db.session.add(job)
+        db.session.commit()
+
+        try:
+            future = self._executor().submit(_execute, kind, params)
+        except Exception as e:
+            job.status, job.error, job.finished_at = 'failed', str(e)[:500], datetime.utcnow()
+            db.session.commit()
+            return job
+        with self._lock:
+            self._futures[job.id] = future
+        future.add_done_callback(lambda f, job_id=job.id: self._finish(app, job_id, f))
+        self._start_heartbeat(app)
+        return job
+
+    def beat(self, app):
+        """Stamp every job this worker is running as still alive."""
+        with self._lock:
+            job_ids = list(self._futures)
+        if not job_ids:
+            return
+        with app.app_context():
+            try:
+                Job.query.filter(Job.id.in_(job_ids), Job.status == 'running').update(
+                    {Job.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+                db.session.commit()
+            finally:
+                db.session.remove()
+
+    def _start_heartbeat(self, app):
+        with self._lock:
+            if self._heartbeat_pid == os.getpid():
+                return
+            self._heartbeat_pid = os.getpid()
+
+        def loop():
+            while True:
+                time.sleep(self.heartbeat_interval)
+                try:
+                    self.beat(app)
+                except Exception as e:
+                    app.logger.warning(f"Job heartbeat failed: {e}")
+
+        threading.Thread(target=loop, name="job-heartbeat", daemon=True).start()
+
+    def _finish(self, app, job_id, future):
+        with self._lock:
+            self._futures.pop(job_id, None)
+        with app.app_context():
+            try:
+                job = db.session.get(Job, job_id)
+                if job is None or job.status == 'cancelled':
+                    return
+                if future.cancelled():
+                    job.status = 'cancelled'
+                elif future.exception() is not None:
+                    job.status, job.error = 'failed', str(future.exception())[:500]
+                else:
+                    job.status, job.result = 'done', json.dumps(future.result())
+                job.finished_at = datetime.utcnow()
+                db.session.commit()
+            finally:
+                db.session.remove()
+
+    def get(self, user_id, job_id):
+        job = Job.query.filter_by(id=job_id, user_id=user_id).first()
+        if job and job.status not in FINISHED and job.id not in self._futures and self._lost(job):
+            # Owned by a worker that is gone (restart/crash) and will never report back
+            job.status, job.error, job.finished_at = 'failed', 'job lost', datetime.utcnow()
+            db.session.commit()
+        return job
+
+    def _lost(self, job):
+        if _owner_exited(job.owner):
+            return True
+        last_seen = job.heartbeat_at or job.created_at
+        return last_seen < datetime.utcnow() - timedelta(seconds=self.lost_after)
+
+    def cancel(self, user_id, job_id):
+        job = Job.query.filter_by(id=job_id, user_id=user_id).first()
+        if job is None or job.status in FINISHED:
+            return job
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            # Only stops queued work; a running computation finishes and its result is dropped
+            future.cancel()
+        job.status, job.finished_at = 'cancelled', datetime.utcnow()
+        db.session.commit()
+        return job
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+job_runner = None
+
+
+def get_job_runner(app):
+    global job_runner
+    if job_runner is None:
+        job_runner = JobRunner(
+            max_workers=app.config['JOB_WORKERS'],
+            result_ttl=app.config['JOB_RESULT_TTL'],
+            lost_after=app.config['JOB_TIMEOUT'],
+            heartbeat_interval=app.config['JOB_HEARTBEAT_INTERVAL']
+        )
+    return job_runner
+
+
+def shutdown_job_runner():
+    if job_runner is not None:
+        job_runner.shutdown()
@@ -0,0 +1,93 @@
+import click
+from sqlalchemy import case, func
+from models import db, LedgerSummary, Transaction, User
+
+
+def totals_query(user_id):
+    return db.session.query(
+        func.coalesce(func.sum(case((Transaction.amount > 0, Transaction.amount), else_=0)), 0),
+        func.coalesce(func.sum(case((Transaction.amount < 0, -Transaction.amount), else_=0)), 0),
+        func.count(Transaction.id),
+        func.max(Transaction.date)
+    ).filter(Transaction.user_id == user_id)
+
+
+def rebuild_summary(user_id):
+    """Recompute a user's LedgerSummary from the raw Transaction rows (no commit)."""
+    income, expenses, count, last = totals_query(user_id).one()
+    summary = db.session.get(LedgerSummary, user_id)
+    if summary is None:
+        summary = LedgerSummary(user_id=user_id)
+        db.session.add(summary)
+    summary.total_income = float(income)
+    summary.total_expenses = float(expenses)
+    summary.tx_count = count
+    summary.last_activity = last
+    db.session.flush()
+    return summary
+
+
+def get_summary(user_id):
+    summary = db.session.get(LedgerSummary, user_id)
+    if summary is None:
+        # Users created before the summary table existed get theirs built on first read
+        summary = rebuild_summary(user_id)
+        db.session.commit()
+    return summary
+
+
+def record_totals(user_id, income, expenses, count, latest=None):
+    """Fold already-written transactions into the user's summary (no commit).
+
+    `income` and `expenses` are positive sums and `count` the number of rows;
+    pass negative values for deletions. `latest` is the newest date among added
+    rows; deletions pass None and last_activity is recomputed from the table.
+    Increments are done in SQL so concurrent writers for one user don't lose
+    updates.
+    """
+    db.session.flush()
+    summary = db.session.get(LedgerSummary, user_id)
+    if summary is None:
+        # The rebuild already sees the flushed inserts/deletes
+        rebuild_summary(user_id)
+        return
+
+    values = {
+        LedgerSummary.total_income: LedgerSummary.total_income + income,
+        LedgerSummary.total_expenses: LedgerSummary.total_expenses + expenses,
+        LedgerSummary.tx_count: LedgerSummary.tx_count + count
+    }
+    if latest is not None:
+        values[LedgerSummary.last_activity] = case(
+            (LedgerSummary.last_activity.is_(None), latest),
+            (LedgerSummary.last_activity < latest, latest),
+            else_=LedgerSummary.last_activity
+        )
+    else:
+        newest = db.session.query(func.max(Transaction.date)).filter(Transaction.user_id == user_id).scalar_subquery()
+        values[LedgerSummary.last_activity] = newest
+
+    db.session.query(LedgerSummary).filter(LedgerSummary.user_id == user_id).update(values, synchronize_session=False)
+    db.session.expire(summary)
+
+
+def record_transaction(tx, sign=1):
+    """Fold an added (sign=1) or deleted (sign=-1) transaction into the owner's summary.
+
+    Call after the row is added/deleted and before the commit, so the summary
+    and the transaction land in the same DB transaction.
+    """
+    income = tx.amount if tx.amount > 0 else 0.0
+    expense = -tx.amount if tx.amount < 0 else 0.0
+    record_totals(tx.user_id, sign * income, sign * expense, sign, tx.date if sign > 0 else None)
+
+
+@click.command('rebuild-ledger')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user.')
+def rebuild_ledger_command(user_id):
+    """Recompute ledger summaries from raw transactions."""
+    user_ids = [user_id] if user_id else [u for (u,) in db.session.query(User.id)]
+    for uid in user_ids:
+        rebuild_summary(uid)
+    db.session.commit()
+    click.echo(f"Rebuilt ledger summary for {len(user_ids)} user(s).")
@@ -0,0 +1,306 @@
+import os
+import re
+import glob
+import json
+import time
+import random
+import bisect
+import atexit
+import cProfile
+import threading
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    "http_requests_total": ("counter", "Requests by endpoint, method and status.", None),
+    "http_request_duration_seconds": ("histogram", "Time to build the response (streamed bodies excluded).",
+                                      DURATION_BUCKETS),
+    "sql_queries_total": ("counter", "SQL statements executed, by endpoint ('background' outside requests).", None),
+    "sql_query_seconds_total": ("counter", "Time spent in SQL statements, by endpoint.", None),
+    "sql_queries_per_request": ("histogram", "SQL statements executed per request.", QUERY_COUNT_BUCKETS),
+    "cache_requests_total": ("counter", "extensions.cache lookups by key prefix and result (hit/miss).", None),
+    "upstream_requests_total": ("counter", "Calls to Yahoo Finance and the RSS feeds by outcome (ok/error).", None),
+    "upstream_request_duration_seconds": ("histogram", "Latency of calls to Yahoo Finance and the RSS feeds.",
+                                          DURATION_BUCKETS),
+}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs, extra=()):
+    pairs = list(pairs) + list(extra)
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}' if pairs else ''
+
+
+class MetricsRegistry:
+    """Counters and histograms for this process, shared with the other workers through files.
+
+    Each process keeps its samples in memory. Once publish() has been called
+    (gunicorn does it in every worker), a background thread writes them to
+    `<directory>/metrics-<pid>.json` every `flush_interval` seconds. Scripts,
+    CLI commands and tests never write a file. render() adds up every
+    process's file, so a scrape of any worker reports the whole host. Files of
+    exited workers are kept so counters never go backwards; gunicorn clears
+    the directory when the master starts.
+    """
+
+    def __init__(self, directory=None, flush_interval=5):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.publishing = False
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._flusher_pid = None
+        # Samples recorded in a preloading gunicorn master must not be reported by every worker
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._counters, self._histograms = {}, {}
+
+    def _key(self, name, labels):
+        self._start_flusher()
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        buckets = METRICS[name][2]
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                # Per-bucket counts (last one is +Inf), sum, count
+                hist = self._histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            hist[0][bisect.bisect_left(buckets, value)] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": [[name, labels, value] for (name, labels), value in self._counters.items()],
+                "histograms": [[name, labels, list(h[0]), h[1], h[2]] for (name, labels), h in self._histograms.items()]
+            }
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f"metrics-{pid}.json")
+
+    def publish(self):
+        """Start writing this process's samples to `directory` for the other workers to read."""
+        self.publishing = True
+
+    def flush(self):
+        if not self.directory or not self.publishing:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(os.getpid())
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    def _start_flusher(self):
+        if not self.directory or not self.publishing or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+
+        def loop():
+            while True:
+                time.sleep(self.flush_interval)
+                self.flush()
+
+        threading.Thread(target=loop, name="metrics-flush", daemon=True).start()
+
+    def collect(self):
+        """Samples of every process: this one from memory, the others from their last flush."""
+        snapshots = [self.snapshot()]
+        if self.directory:
+            own = self._path(os.getpid())
+            for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+                if path == own:
+                    continue
+                try:
+                    with open(path) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+
+        counters, histograms = {}, {}
+        for snap in snapshots:
+            for name, labels, value in snap["counters"]:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, buckets, total, count in snap["histograms"]:
+                key = (name, tuple(map(tuple, labels)))
+                merged = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+                merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+                merged[1] += total
+                merged[2] += count
+        return counters, histograms
+
+    def render(self):
+        """Prometheus text exposition format (0.0.4)."""
+        counters, histograms = self.collect()
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            if kind == "counter":
+                lines += [f"{name}{_labels(labels)} {value}"
+                          for (n, labels), value in sorted(counters.items()) if n == name]
+                continue
+            for (n, labels), (counts, total, count) in sorted(histograms.items()):
+                if n != name:
+                    continue
+                cumulative = 0
+                for bound, c in zip(list(buckets) + ["+Inf"], counts):
+                    cumulative += c
+                    lines.append(f"{name}_bucket{_labels(labels, [('le', bound)])} {cumulative}")
+                lines += [f"{name}_sum{_labels(labels)} {total}", f"{name}_count{_labels(labels)} {count}"]
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+def clear_metrics_dir(directory):
+    for path in glob.glob(os.path.join(directory, "metrics-*.json")):
+        os.remove(path)
+
+
+def _endpoint():
+    return request.endpoint or "unmatched"
+
+
+@contextmanager
+def upstream_call(upstream, call):
+    """Time one call to an external service and count it as ok or error."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        metrics.observe("upstream_request_duration_seconds", time.perf_counter() - start, upstream=upstream, call=call)
+        metrics.inc("upstream_requests_total", upstream=upstream, call=call, outcome=outcome)
+
+
+class InstrumentedCache:
+    """Proxy for the extensions.cache backend that counts hits and misses by key prefix."""
+
+    _prefix = re.compile(r"[A-Za-z_]*")
+
+    def __init__(self, backend):
+        self._backend = backend
+
+    def __getattr__(self, name):
+        return getattr(self._backend, name)
+
+    def _count(self, key, value):
+        metrics.inc("cache_requests_total", prefix=self._prefix.match(key).group() or "other",
+                    result="miss" if value is None else "hit")
+
+    def get(self, key):
+        value = self._backend.get(key)
+        self._count(key, value)
+        return value
+
+    def get_or_lease(self, key):
+        if hasattr(self._backend, 'get_or_lease'):
+            value, leased = self._backend.get_or_lease(key)
+        else:
+            value, leased = self._backend.get(key), False
+        self._count(key, value)
+        return value, leased
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    endpoint = "background"
+    if has_request_context():
+        endpoint = _endpoint()
+        g.sql_queries = g.get("sql_queries", 0) + 1
+    metrics.inc("sql_queries_total", endpoint=endpoint)
+    metrics.inc("sql_query_seconds_total", elapsed, endpoint=endpoint)
+
+
+def _handle_error(context):
+    starts = context.connection.info.get("query_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+_profile_lock = threading.Lock()
+
+
+def init_metrics(app, cache):
+    """Instrument requests, SQL and `cache`, and start collecting into METRICS_DIR."""
+    metrics.directory = app.config['METRICS_DIR']
+    metrics.flush_interval = app.config['METRICS_FLUSH_INTERVAL']
+    atexit.register(metrics.flush)
+
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+    backend = app.extensions["cache"][cache]
+    if not isinstance(backend, InstrumentedCache):
+        app.extensions["cache"][cache] = InstrumentedCache(backend)
+
+    profile = app.config['PROFILE_SLOW_REQUESTS']
+    sample_rate = app.config['PROFILE_SAMPLE_RATE']
+    slow = app.config['PROFILE_SLOW_MS'] / 1000
+    profile_dir = app.config['PROFILE_DIR']
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_start = time.perf_counter()
+        g.sql_queries = 0
+        # cProfile only follows the thread that enabled it, and one profiler per process at a time
+        if profile and random.random() < sample_rate and _profile_lock.acquire(blocking=False):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def record_request_metrics(response):
+        if 'request_start' in g:
+            endpoint = _endpoint()
+            metrics.inc("http_requests_total", endpoint=endpoint, method=request.method,
+                        status=str(response.status_code))
+            metrics.observe("http_request_duration_seconds", time.perf_counter() - g.request_start,
+                            endpoint=endpoint, method=request.method)
+            metrics.observe("sql_queries_per_request", g.sql_queries, endpoint=endpoint)
+        return response
+
+    @app.teardown_request
+    def save_slow_profile(exc):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return
+        profiler.disable()
+        _profile_lock.release()
+        elapsed = time.perf_counter() - g.request_start
+        if elapsed >= slow:
+            os.makedirs(profile_dir, exist_ok=True)
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{_endpoint()}-{int(elapsed * 1000)}ms-{os.getpid()}.prof"
+            profiler.dump_stats(os.path.join(profile_dir, name))
@@ -0,0 +1,82 @@
+import numpy as np
+
+# Long-run annual assumptions per asset class: (expected return, volatility)
+ASSET_CLASSES = {
+    "Stocks": (0.12, 0.18),
+    "Crypto/Alt": (0.25, 0.70),
+    "Real Estate": (0.09, 0.12),
+    "Gold": (0.08, 0.15),
+    "Fixed Deposits (FD)": (0.07, 0.01),
+    "Govt Bonds": (0.06, 0.05),
+}
+
+# Correlation of annual returns, in ASSET_CLASSES order
+CORRELATION = np.array([
+    [1.00, 0.35, 0.40, -0.05, 0.00, -0.10],
+    [0.35, 1.00, 0.15, 0.10, 0.00, -0.05],
+    [0.40, 0.15, 1.00, 0.10, 0.05, 0.05],
+    [-0.05, 0.10, 0.10, 1.00, 0.00, 0.15],
+    [0.00, 0.00, 0.05, 0.00, 1.00, 0.30],
+    [-0.10, -0.05, 0.05, 0.15, 0.30, 1.00],
+])
+
+PERCENTILES = (10, 50, 90)
+
+
+def expected_growth(label):
+    return round(1 + ASSET_CLASSES[label][0], 2)
+
+
+def _lognormal_params(labels):
+    mean = np.array([ASSET_CLASSES[l][0] for l in labels])
+    vol = np.array([ASSET_CLASSES[l][1] for l in labels])
+    # Match the arithmetic mean/volatility of gross returns with a lognormal
+    sigma = np.sqrt(np.log1p((vol / (1 + mean)) ** 2))
+    mu = np.log1p(mean) - 0.5 * sigma ** 2
+    return mu, sigma
+
+
+def simulate(weights, amount, years=10, paths=10000, yearly_contribution=0.0, goal=None, seed=None):
+    """Monte Carlo wealth projection for a yearly-rebalanced allocation.
+
+    `weights` maps asset-class labels to portfolio weights (any scale). All
+    paths are drawn in one (paths, years, assets) NumPy pass: correlated
+    normals via a Cholesky factor, lognormal gross returns per asset, then the
+    weighted portfolio return compounded along the year axis.
+
+    Returns percentile bands by year and, if `goal` is given, the share of
+    paths that end at or above it.
+    """
+    labels = [l for l, w in weights.items() if w > 0]
+    w = np.array([weights[l] for l in labels], dtype=float)
+    w /= w.sum()
+
+    order = [list(ASSET_CLASSES).index(l) for l in labels]
+    chol = np.linalg.cholesky(CORRELATION[np.ix_(order, order)])
+    mu, sigma = _lognormal_params(labels)
+
+    rng = np.random.default_rng(seed)
+    z = rng.standard_normal((paths, years, len(labels))) @ chol.T
+    growth = np.exp(mu + sigma * z) @ w
+
+    if yearly_contribution:
+        # Contributions land at the start of each year and grow with it
+        wealth = np.empty((paths, years))
+        balance = np.full(paths, float(amount))
+        for year in range(years):
+            balance = (balance + yearly_contribution) * growth[:, year]
+            wealth[:, year] = balance
+    else:
+        wealth = amount * np.cumprod(growth, axis=1)
+
+    bands = np.percentile(wealth, PERCENTILES, axis=0)
+    result = {
+        "years": list(range(1, years + 1)),
+        "paths": paths,
+    }
+    for p, band in zip(PERCENTILES, bands):
+        result[f"p{p}"] = np.round(band).tolist()
+    if goal is not None:
+        result["goal"] = goal
+        result["probability"] = round(float((wealth[:, -1] >= goal).mean()), 4)
+    return result
@@ -0,0 +1,296 @@
+import math
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from services.guard import UNKNOWN_SYMBOL
+from services.metrics import upstream_call
+from services.symbols import is_bse_code, resolve_yahoo
+
+# SENSEX (^BSESN), NIFTY 50 (^NSEI), BANK NIFTY (^NSEBANK), NASDAQ (^IXIC)
+INDEX_TICKERS = {
+    "SENSEX": "^BSESN",
+    "NIFTY 50": "^NSEI",
+    "BANK NIFTY": "^NSEBANK",
+    "NASDAQ": "^IXIC"
+}
+
+
+def to_yahoo_symbol(sym):
+    # Indices (^) and qualified symbols (.BO, .NS) pass through; bare tickers are
+    # resolved through the symbol master, falling back to a BSE listing for
+    # numeric scrip codes and an NSE listing otherwise
+    if '.' in sym or '^' in sym:
+        return sym
+    return resolve_yahoo(sym) or f"{sym}{'.BO' if is_bse_code(sym) else '.NS'}"
+
+
+class QuoteProvider:
+    """Interface for quote sources.
+
+    fetch() takes a list of Yahoo symbols and returns (quotes, errors) where
+    quotes maps symbol -> {"price", "prev_close"} and errors maps symbol -> reason.
+    """
+
+    def fetch(self, symbols):
+        raise NotImplementedError
+
+
+class YFinanceProvider(QuoteProvider):
+    def __init__(self, max_workers=8, timeout=10):
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+    def _fetch_one(self, symbol):
+        import yfinance as yf
+        with upstream_call("yahoo", "quote"):
+            try:
+                info = yf.Ticker(symbol).fast_info
+                price, prev_close = info.last_price, info.previous_close
+            except KeyError as e:
+                raise LookupError(f"{UNKNOWN_SYMBOL}: {e}")
+            if price is None or math.isnan(price):
+                raise LookupError(f"{UNKNOWN_SYMBOL}: no price data")
+        return {"price": float(price), "prev_close": float(prev_close)}
+
+    def fetch(self, symbols):
+        quotes, errors = {}, {}
+        if not symbols:
+            return quotes, errors
+
+        # fast_info is one HTTP round-trip per ticker, so fan the batch out instead of walking it
+        workers = min(self.max_workers, len(symbols))
+        pool = ThreadPoolExecutor(max_workers=workers)
+        deadline = time.time() + self.timeout
+        try:
+            futures = {sym: pool.submit(self._fetch_one, sym) for sym in symbols}
+            for sym, fut in futures.items():
+                try:
+                    quotes[sym] = fut.result(timeout=max(0, deadline - time.time()))
+                except TimeoutError:
+                    errors[sym] = f"timed out after {self.timeout}s"
+                except Exception as e:
+                    errors[sym] = str(e) or e.__class__.__name__
+        finally:
+            # Don't wait for calls stuck past the deadline
+            pool.shutdown(wait=False, cancel_futures=True)
+        return quotes, errors
+
+
+class StaticQuoteProvider(QuoteProvider):
+    """Deterministic offline provider for tests and benchmarks.
+
+    Prices are derived from the symbol name unless given explicitly; `latency`
+    simulates one upstream round-trip per fetch() call.
+    """
+
+    def __init__(self, prices=None, latency=0.0, fail=()):
+        self.prices = dict(prices or {})
+        self.latency = latency
+        self.fail = set(fail)
+        self.calls = 0
+
+    def _price_for(self, symbol):
+        if symbol in self.prices:
+            return self.prices[symbol]
+        seed = sum(ord(c) * (i + 1) for i, c in enumerate(symbol))
+        return 100.0 + seed % 4900
+
+    def fetch(self, symbols):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        quotes, errors = {}, {}
+        for sym in symbols:
+            if sym in self.fail:
+                errors[sym] = UNKNOWN_SYMBOL
+                continue
+            price = self._price_for(sym)
+            quotes[sym] = {"price": price, "prev_close": price / 1.01}
+        return quotes, errors
+
+
+class GuardedQuoteProvider(QuoteProvider):
+    """Routes a provider's fetches through an UpstreamGuard.
+
+    Symbols in the negative cache are answered without a call, an open
+    circuit fails the whole batch at once, and only as many symbols as the
+    shared token bucket allows go upstream (a random subset, so the rest get
+    their turn on later calls).
+    """
+
+    def __init__(self, provider, guard):
+        self.provider = provider
+        self.guard = guard
+
+    def fetch(self, symbols):
+        errors = self.guard.negative(symbols)
+        wanted = [s for s in symbols if s not in errors]
+        if not wanted:
+            return {}, errors
+        if not self.guard.allow():
+            errors.update((s, "upstream unavailable") for s in wanted)
+            return {}, errors
+
+        random.shuffle(wanted)
+        granted = self.guard.acquire(len(wanted))
+        errors.update((s, "rate limited") for s in wanted[granted:])
+        wanted = wanted[:granted]
+        if not wanted:
+            return {}, errors
+
+        try:
+            quotes, failed = self.provider.fetch(sorted(wanted))
+        except Exception as e:
+            self.guard.failure()
+            errors.update((s, str(e) or e.__class__.__name__) for s in wanted)
+            return {}, errors
+
+        unknown = {s: r for s, r in failed.items() if r.startswith(UNKNOWN_SYMBOL)}
+        if quotes or unknown:
+            self.guard.success()
+        elif failed:
+            self.guard.failure()
+        self.guard.mark_negative(unknown)
+        errors.update(failed)
+        return quotes, errors
+
+
+class QuoteService:
+    """Per-symbol quote cache in front of a QuoteProvider.
+
+    Each symbol carries its own fetch time, so overlapping watchlists reuse
+    entries and a request only goes upstream for the symbols that are stale.
+    With a `shared` cache (extensions.cache) every fetched quote is also
+    stored there, and lookups pick up quotes other workers fetched, so a
+    symbol is fetched once per host rather than once per worker.
+    """
+
+    def __init__(self, provider=None, ttl=30, stale_after=120, shared=None):
+        self.provider = provider or YFinanceProvider()
+        self.ttl = ttl
+        # Quotes older than this are still served (last known good) but flagged stale
+        self.stale_after = stale_after
+        self.shared = shared
+        self._quotes = {}
+        self._lock = threading.Lock()
+        # Bumped whenever a stored price actually moves; stream readers block on _changed
+        self.version = 0
+        self._changed = threading.Condition(self._lock)
+
+    def _fresh(self, yahoo_syms, max_age):
+        self.sync(yahoo_syms)
+        now = time.time()
+        with self._lock:
+            return {
+                s: self._quotes[s] for s in yahoo_syms
+                if s in self._quotes and now - self._quotes[s]["fetched_at"] <= max_age
+            }
+
+    def _remember(self, quotes):
+        now = time.time()
+        with self._lock:
+            moved = False
+            for sym, q in quotes.items():
+                old = self._quotes.get(sym)
+                if old is None or (old["price"], old["prev_close"]) != (q["price"], q["prev_close"]):
+                    if not moved:
+                        self.version += 1
+                        moved = True
+                    changed_at = self.version
+                else:
+                    changed_at = old["version"]
+                self._quotes[sym] = dict(q, fetched_at=q.get("fetched_at", now), version=changed_at)
+            if moved:
+                self._changed.notify_all()
+
+    def store(self, quotes):
+        self._remember(quotes)
+        if self.shared is not None and quotes:
+            with self._lock:
+                stored = {f"quote/{s}": {k: self._quotes[s][k] for k in ("price", "prev_close", "fetched_at")}
+                          for s in quotes}
+            # Last known good quotes are served however old, so they don't expire
+            self.shared.set_many(stored, timeout=0)
+
+    def sync(self, yahoo_syms):
+        """Copy quotes for `yahoo_syms` that other workers stored in the shared cache, when newer than ours."""
+        if self.shared is None or not yahoo_syms:
+            return
+        syms = sorted(yahoo_syms)
+        values = self.shared.get_many(*[f"quote/{s}" for s in syms])
+        with self._lock:
+            newer = {s: q for s, q in zip(syms, values)
+                     if q is not None and (s not in self._quotes or self._quotes[s]["fetched_at"] < q["fetched_at"])}
+        if newer:
+            self._remember(newer)
+
+    def wait_for_change(self, since, timeout):
+        """Block until the store version passes `since` or `timeout` elapses; returns the current version."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version > since, timeout)
+            return self.version
+
+    def changed_since(self, symbols, since):
+        """peek() restricted to the requested symbols whose price moved after version `since`."""
+        lookup = {sym: to_yahoo_symbol(sym) for sym in symbols}
+        with self._lock:
+            moved = {s: self._quotes[s] for s in set(lookup.values())
+                     if s in self._quotes and self._quotes[s]["version"] > since}
+        quotes, _ = self._present({sym: y for sym, y in lookup.items() if y in moved}, moved)
+        return quotes
+
+    def refresh(self, yahoo_syms):
+        """Fetch the given Yahoo symbols unconditionally and store the results."""
+        fetched, errors = self.provider.fetch(sorted(set(yahoo_syms)))
+        self.store(fetched)
+        return fetched, errors
+
+    def ages(self):
+        now = time.time()
+        with self._lock:
+            return {s: now - q["fetched_at"] for s, q in self._quotes.items()}
+
+    def _present(self, lookup, cached):
+        now = time.time()
+        quotes, failed = {}, []
+        for sym, yahoo_sym in lookup.items():
+            q = cached.get(yahoo_sym)
+            if q is None or not q["prev_close"]:
+                failed.append(sym)
+                continue
+            quotes[sym] = dict(q, change=(q["price"] - q["prev_close"]) / q["prev_close"] * 100,
+                               stale=now - q["fetched_at"] > self.stale_after)
+        return quotes, failed
+
+    def peek(self, symbols):
+        """Like get_quotes() but never calls the provider, only reads stored quotes.
+
+        Symbols with no stored quote come back in the second element.
+        """
+        lookup = {sym: to_yahoo_symbol(sym) for sym in symbols}
+        return self._present(lookup, self._fresh(set(lookup.values()), float('inf')))
+
+    def get_quotes(self, symbols, max_age=None):
+        """Return (quotes, failed) for the requested symbols.
+
+        quotes maps each requested symbol (as given) to a quote dict with
+        price, prev_close, change (percent), fetched_at and stale; failed lists
+        the requested symbols that could not be priced. When a refetch fails
+        the last stored quote is returned, however old, with stale set.
+        """
+        max_age = self.ttl if max_age is None else max_age
+        lookup = {sym: to_yahoo_symbol(sym) for sym in symbols}
+
+        cached = self._fresh(set(lookup.values()), max_age)
+        missing = sorted(set(lookup.values()) - set(cached))
+        errors = {}
+        if missing:
+            fetched, errors = self.provider.fetch(missing)
+            self.store(fetched)
+            cached.update(self._fresh(missing, float('inf')))
+
+        return self._present(lookup, cached)
+
+
+quote_service = QuoteService()
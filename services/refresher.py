@@ -0,0 +1,203 @@
+import os
+import time
+import uuid
+import threading
+
+from services.quotes import INDEX_TICKERS, quote_service, to_yahoo_symbol
+
+
+class QuoteRefresher:
+    """Background thread that keeps the quote service's store warm.
+
+    Every worker runs one, but only the worker holding the leader key in the
+    quote service's shared cache calls upstream. Every `interval` seconds it
+    refreshes the market indices, every symbol held in any user's Portfolio,
+    and any symbol a request in any worker recently asked for; the quotes go
+    to the shared cache. The other workers copy the quotes their requests and
+    streams watch into memory every `poll` seconds, so request handlers can
+    answer from memory via QuoteService.peek(). When the leader exits, another
+    worker takes over once its key expires.
+    """
+
+    LEADER_KEY = "quote_refresher/leader"
+    WATCHED_KEY = "quote_refresher/watched"
+    RUN_KEY = "quote_refresher/run"
+
+    def __init__(self, service, interval=30, watch_ttl=600, poll=2):
+        self.service = service
+        self.interval = interval
+        self.watch_ttl = watch_ttl
+        self.poll = poll
+        self.last_run = None
+        self.last_errors = {}
+        self.leading = False
+        self._token = None
+        self._refreshed_at = None
+        self._watched = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def watch(self, symbols):
+        """Ask for symbols to be refreshed; wakes the thread if any are new."""
+        now = time.time()
+        new = False
+        with self._lock:
+            for sym in symbols:
+                yahoo_sym = to_yahoo_symbol(sym)
+                new = new or yahoo_sym not in self._watched
+                self._watched[yahoo_sym] = now
+        if new:
+            self._wake.set()
+
+    def _lead(self):
+        """Take or renew the leader key; True while this worker is the one refreshing."""
+        shared = self.service.shared
+        if shared is None:
+            self.leading = True
+            return True
+        if self._token is None:
+            self._token = f"{os.getpid()}-{uuid.uuid4().hex}"
+        lease = max(self.interval, self.poll) * 3
+        if shared.get(self.LEADER_KEY) == self._token:
+            shared.set(self.LEADER_KEY, self._token, timeout=lease)
+            self.leading = True
+        else:
+            self.leading = bool(shared.add(self.LEADER_KEY, self._token, timeout=lease))
+        if not self.leading:
+            self._refreshed_at = None
+        return self.leading
+
+    def _share_watched(self):
+        """Merge this worker's watched symbols into the shared list; returns every worker's."""
+        cutoff = time.time() - self.watch_ttl
+        with self._lock:
+            for sym in [s for s, t in self._watched.items() if t < cutoff]:
+                del self._watched[sym]
+            mine = dict(self._watched)
+        shared = self.service.shared
+        if shared is None:
+            return set(mine)
+
+        current = shared.get(self.WATCHED_KEY) or {}
+        merged = {s: t for s, t in current.items() if t >= cutoff}
+        # Only write when a symbol is new or about to lapse; a lost concurrent update is redone next poll
+        renew = {s: t for s, t in mine.items() if merged.get(s, 0) < t - self.watch_ttl / 2}
+        if renew or len(merged) != len(current):
+            merged.update(renew)
+            shared.set(self.WATCHED_KEY, merged, timeout=self.watch_ttl)
+        return set(merged)
+
+    def _portfolio_symbols(self, app):
+        from models import db, Portfolio
+        with app.app_context():
+            rows = db.session.query(Portfolio.symbol).distinct().all()
+            db.session.remove()
+        return {to_yahoo_symbol(r[0]) for r in rows if r[0]}
+
+    def _targets(self, app, watched):
+        symbols = set(INDEX_TICKERS.values()) | watched
+        try:
+            symbols |= self._portfolio_symbols(app)
+        except Exception as e:
+            app.logger.warning(f"Quote refresher could not read portfolios: {e}")
+        return symbols
+
+    def run_once(self, app):
+        watched = self._share_watched()
+        if not self._lead():
+            with self._lock:
+                mine = set(self._watched)
+            self.service.sync(set(INDEX_TICKERS.values()) | mine)
+            self._read_run()
+            return
+
+        now = time.time()
+        if self._refreshed_at is None or now - self._refreshed_at >= self.interval:
+            _, self.last_errors = self.service.refresh(self._targets(app, watched))
+            self._refreshed_at = now
+        else:
+            # Between full passes only symbols nobody has a quote for yet are fetched
+            new = watched - set(self.service.ages()) - set(self.last_errors)
+            if not new:
+                return
+            _, errors = self.service.refresh(new)
+            self.last_errors = {s: r for s, r in self.last_errors.items() if s not in new}
+            self.last_errors.update(errors)
+        self.last_run = time.time()
+        if self.service.shared is not None:
+            self.service.shared.set(self.RUN_KEY, {"at": self.last_run, "errors": self.last_errors}, timeout=0)
+
+    def _read_run(self):
+        run = self.service.shared.get(self.RUN_KEY)
+        if run is not None:
+            self.last_run, self.last_errors = run["at"], run["errors"]
+
+    def _loop(self, app):
+        while not self._stop.is_set():
+            try:
+                self.run_once(app)
+            except Exception as e:
+                app.logger.error(f"Quote refresh failed: {e}")
+            self._wake.wait(self.poll)
+            self._wake.clear()
+
+    def start(self, app):
+        if self.running:
+            return
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, args=(app,), name="quote-refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        # Hand over to another worker now rather than when the key expires
+        shared = self.service.shared
+        if self.leading and shared is not None and shared.get(self.LEADER_KEY) == self._token:
+            shared.delete(self.LEADER_KEY)
+        self.leading = False
+
+    def status(self):
+        return {
+            "running": self.running,
+            "leader": self.leading,
+            "interval": self.interval,
+            "last_run_age": None if self.last_run is None else round(time.time() - self.last_run, 1),
+            "quote_ages": {s: round(a, 1) for s, a in sorted(self.service.ages().items())},
+            "errors": self.last_errors
+        }
+
+
+quote_refresher = QuoteRefresher(quote_service)
+
+
+def read_quotes(symbols):
+    """Return (quotes, failed, pending) for request handlers.
+
+    With the refresher running, answers come from stored quotes and unknown
+    symbols are only registered for the next refresh (they come back as
+    pending); otherwise, or before the first pass on the host completes,
+    stale ones are fetched inline.
+    """
+    if not quote_refresher.running or quote_refresher.last_run is None:
+        quotes, failed = quote_service.get_quotes(symbols)
+        return quotes, failed, []
+
+    quotes, missing = quote_service.peek(symbols)
+    if missing:
+        quote_refresher.watch(missing)
+    failed = [s for s in missing if to_yahoo_symbol(s) in quote_refresher.last_errors]
+    pending = [s for s in missing if s not in failed]
+    return quotes, failed, pending
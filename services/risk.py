@@ -0,0 +1,137 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import numpy as np
+from services.quotes import INDEX_TICKERS, to_yahoo_symbol
+
+BENCHMARK = INDEX_TICKERS["NIFTY 50"]
+TRADING_DAYS = 252
+VAR_LEVELS = (95, 99)
+MEMO_SIZE = 256
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+# Shared by all requests: HistoryStore keeps one SQLite connection per thread, so a
+# fixed set of threads keeps a fixed set of connections open
+_refresh_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='risk-refresh')
+
+
+def _current_date(store, symbol):
+    # A symbol with no usable history is reported as missing instead of failing the whole report
+    try:
+        return store.current_date(symbol)
+    except Exception:
+        return None
+
+
+def _current_dates(store, symbols):
+    # Stale symbols are re-fetched from the provider, so refresh them in parallel
+    return dict(zip(symbols, _refresh_pool.map(lambda symbol: _current_date(store, symbol), symbols)))
+
+
+def _load(store, symbols, days):
+    # Calendar-day window that comfortably covers `days` trading sessions
+    start = (date.today() - timedelta(days=int(days * 1.5) + 10)).isoformat()
+    series = {}
+    for sym in symbols:
+        dates, closes = store.closes(sym, start=start, refresh=False)
+        series[sym] = (np.array(dates), np.array(closes, dtype=float))
+    return series
+
+
+def aligned_prices(series, symbols, days):
+    """Inner-join the series on date and keep the last `days` + 1 rows: a (dates, symbols) price matrix."""
+    common = None
+    for sym in symbols:
+        common = series[sym][0] if common is None else np.intersect1d(common, series[sym][0], assume_unique=True)
+    common = common[-(days + 1):]
+    columns = [series[sym][1][np.isin(series[sym][0], common, assume_unique=True)] for sym in symbols]
+    return common, np.column_stack(columns)
+
+
+def risk_metrics(prices, weights):
+    """All metrics for every column of `prices` (last column = benchmark) plus the weighted portfolio."""
+    returns = prices[1:] / prices[:-1] - 1
+    returns = np.column_stack([returns, returns[:, :-1] @ weights])
+
+    centered = returns - returns.mean(axis=0)
+    n = len(returns)
+    cov_bench = centered.T @ centered[:, -2] / (n - 1)
+    variance = (centered ** 2).sum(axis=0) / (n - 1)
+
+    # Start every wealth path at 1 so a fall from the first close counts as drawdown
+    wealth = np.vstack([np.ones(returns.shape[1]), np.cumprod(1 + returns, axis=0)])
+    drawdown = 1 - wealth / np.maximum.accumulate(wealth, axis=0)
+
+    return {
+        "volatility": np.sqrt(variance * TRADING_DAYS),
+        "beta": cov_bench / variance[-2],
+        "max_drawdown": drawdown.max(axis=0),
+        "var": {level: -np.percentile(returns, 100 - level, axis=0) for level in VAR_LEVELS},
+        "correlation": np.corrcoef(returns[:, :-2], rowvar=False),
+        "observations": n
+    }
+
+
+def portfolio_risk(store, holdings, days=TRADING_DAYS * 3):
+    """Risk report for a user's holdings from the shared daily history.
+
+    `holdings` maps symbols to quantities. Portfolio weights are market values
+    at the last common close, or equal weights for a watchlist with no
+    quantities. Results are memoized on the holdings and each series' newest
+    bar date, so repeat views are free until new bars are stored.
+    """
+    lookup = {sym: to_yahoo_symbol(sym) for sym in holdings}
+    yahoo_syms = sorted(set(lookup.values()) | {BENCHMARK})
+    as_of = _current_dates(store, yahoo_syms)
+
+    key = (tuple(sorted(holdings.items())), days, tuple(as_of[s] for s in yahoo_syms))
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            return _memo[key]
+
+    series = _load(store, [s for s in yahoo_syms if as_of[s] is not None], days)
+    missing = sorted(sym for sym, y in lookup.items() if y not in series)
+    symbols = sorted(sym for sym in holdings if sym not in missing)
+    report = {"as_of": max(filter(None, as_of.values()), default=None), "benchmark": BENCHMARK,
+              "missing": missing, "symbols": symbols}
+
+    if BENCHMARK not in series or not symbols:
+        report["error"] = "Not enough price history"
+    else:
+        columns = [lookup[s] for s in symbols] + [BENCHMARK]
+        dates, prices = aligned_prices(series, columns, days)
+        if len(dates) < 30:
+            report["error"] = "Not enough overlapping price history"
+        else:
+            qty = np.array([holdings[s] for s in symbols], dtype=float)
+            value = qty * prices[-1, :-1]
+            weights = value / value.sum() if value.sum() > 0 else np.full(len(symbols), 1 / len(symbols))
+            m = risk_metrics(prices, weights)
+
+            def row(i):
+                return {
+                    "volatility": round(float(m["volatility"][i]) * 100, 2),
+                    "beta": round(float(m["beta"][i]), 3),
+                    "max_drawdown": round(float(m["max_drawdown"][i]) * 100, 2),
+                    **{f"var_{level}": round(float(v[i]) * 100, 2) for level, v in m["var"].items()}
+                }
+
+            report.update({
+                "start": str(dates[0]),
+                "end": str(dates[-1]),
+                "observations": m["observations"],
+                "weights": dict(zip(symbols, np.round(weights * 100, 2).tolist())),
+                "per_symbol": {sym: row(i) for i, sym in enumerate(symbols)},
+                "benchmark_metrics": row(len(symbols)),
+                "portfolio": row(len(symbols) + 1),
+                "correlation": np.round(np.atleast_2d(m["correlation"]), 3).tolist()
+            })
+
+    with _memo_lock:
+        _memo[key] = report
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+    return report
@@ -0,0 +1,242 @@
+import os
+import math
+import time
+import pickle
+import random
+import sqlite3
+import threading
+from functools import wraps
+from flask import Response, make_response, request
+from flask_caching.backends.base import BaseCache
+
+
+class SQLiteCache(BaseCache):
+    """Flask-Caching backend in a SQLite file shared by every worker on the host.
+
+    Select it with CACHE_TYPE = 'services.sharedcache.SQLiteCache'. get() is a
+    plain read with no side effects. Callers that recompute an expensive value
+    use get_or_lease() instead, which protects the recomputation:
+
+    - Single flight: the first caller to miss an expired key takes a short
+      lease and gets (None, True), so it recomputes and calls set(), or
+      release() if it gives up; concurrent callers get the stale value, or
+      wait up to `wait_timeout` for the new one when there is nothing stale
+      to serve.
+    - Probabilistic early expiration (XFetch): a hit may be treated as a miss
+      shortly before expiry, more likely the closer expiry is and the longer
+      the value took to compute, so a hot key is usually refreshed by one
+      caller before it ever expires.
+
+    Expired values are kept for `stale_ttl` seconds so they can be served while
+    the lease holder recomputes.
+    """
+
+    def __init__(self, path, default_timeout=300, stale_ttl=300, lease_timeout=30,
+                 wait_timeout=5, beta=1.0, ignore_delete_many_errors=False):
+        super().__init__(default_timeout=default_timeout, ignore_delete_many_errors=ignore_delete_many_errors)
+        self.path = path
+        self.stale_ttl = stale_ttl
+        self.lease_timeout = lease_timeout
+        self.wait_timeout = wait_timeout
+        self.beta = beta
+        self._local = threading.local()
+        self._schema_ready = False
+        self._last_purge = 0
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        kwargs.update(
+            path=config['CACHE_SQLITE_PATH'],
+            stale_ttl=config.get('CACHE_STALE_TTL', 300),
+            lease_timeout=config.get('CACHE_LEASE_TIMEOUT', 30)
+        )
+        return cls(*args, **kwargs)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        if not self._schema_ready:
+            # expires = 0 means no expiry; delta is how long the value took to compute
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value BLOB,
+                    expires REAL NOT NULL,
+                    delta REAL NOT NULL DEFAULT 0,
+                    lease REAL NOT NULL DEFAULT 0
+                ) WITHOUT ROWID
+            """)
+            self._schema_ready = True
+        return conn
+
+    def _expires(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return 0 if timeout == 0 else time.time() + timeout
+
+    def _take_lease(self, key, now):
+        # Atomic across processes: only one caller moves the lease forward
+        cur = self._conn().execute(
+            "UPDATE cache SET lease = ? WHERE key = ? AND lease < ?",
+            (now, key, now - self.lease_timeout)
+        )
+        if cur.rowcount == 1:
+            return True
+        # No row at all: claim by inserting a placeholder without a value
+        cur = self._conn().execute(
+            "INSERT OR IGNORE INTO cache (key, value, expires, lease) VALUES (?, NULL, ?, ?)",
+            (key, now, now)
+        )
+        return cur.rowcount == 1
+
+    def _read(self, key):
+        return self._conn().execute(
+            "SELECT value, expires, delta, lease FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+
+    def get(self, key):
+        row = self._read(key)
+        if row is None or row[0] is None or (row[1] != 0 and time.time() >= row[1]):
+            return None
+        return pickle.loads(row[0])
+
+    def get_many(self, *keys):
+        # One query per 500 keys instead of a get() per key
+        conn = self._conn()
+        rows = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows.update((r[0], r[1:]) for r in conn.execute(
+                f"SELECT key, value, expires FROM cache WHERE key IN ({','.join('?' * len(chunk))})", chunk))
+        now = time.time()
+        values = []
+        for key in keys:
+            value, expires = rows.get(key, (None, 0))
+            values.append(None if value is None or (expires != 0 and now >= expires) else pickle.loads(value))
+        return values
+
+    def get_or_lease(self, key):
+        """Single-flight read: (value, False) to serve, or (None, True) when this caller must recompute.
+
+        A caller that gets the lease must follow with set() or release().
+        (None, False) means the wait for another caller's value timed out.
+        """
+        now = time.time()
+        row = self._read(key)
+        if row is not None:
+            value, expires, delta, lease = row
+            if value is not None and (expires == 0 or now < expires):
+                early = delta and expires and now - delta * self.beta * math.log(random.random() or 1e-12) >= expires
+                if not early or not self._take_lease(key, now):
+                    return pickle.loads(value), False
+                return None, True
+            if value is not None and now < expires + self.stale_ttl:
+                # Expired: one caller recomputes, everyone else is served stale
+                if self._take_lease(key, now):
+                    return None, True
+                return pickle.loads(value), False
+
+        if self._take_lease(key, now):
+            return None, True
+        # Someone else is computing a value we have nothing stale for: wait for it
+        deadline = now + self.wait_timeout
+        while time.time() < deadline:
+            time.sleep(0.05)
+            value = self.get(key)
+            if value is not None:
+                return value, False
+        return None, False
+
+    def release(self, key):
+        """Give up a lease from get_or_lease() without storing a value."""
+        conn = self._conn()
+        conn.execute("DELETE FROM cache WHERE key = ? AND value IS NULL", (key,))
+        conn.execute("UPDATE cache SET lease = 0 WHERE key = ?", (key,))
+
+    def set(self, key, value, timeout=None):
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute("SELECT lease FROM cache WHERE key = ?", (key,)).fetchone()
+        # A set() that follows our own lease tells us how long the value took to compute
+        delta = now - row[0] if row and row[0] and now - row[0] < self.lease_timeout else 0
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires, delta, lease) VALUES (?, ?, ?, ?, 0)",
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self._expires(timeout), delta)
+        )
+        self._purge(now)
+        return True
+
+    def add(self, key, value, timeout=None):
+        now = time.time()
+        cur = self._conn().execute(
+            "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, lease = 0 "
+            "WHERE cache.value IS NULL OR (cache.expires != 0 AND cache.expires <= ?)",
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self._expires(timeout), now)
+        )
+        return cur.rowcount == 1
+
+    def has(self, key):
+        row = self._read(key)
+        return row is not None and row[0] is not None and (row[1] == 0 or time.time() < row[1])
+
+    def delete(self, key):
+        return self._conn().execute("DELETE FROM cache WHERE key = ?", (key,)).rowcount == 1
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache")
+        return True
+
+    def _purge(self, now):
+        # Opportunistic cleanup of entries past their stale window, at most once a minute per process
+        if now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        self._conn().execute(
+            "DELETE FROM cache WHERE expires != 0 AND expires < ? AND lease < ?",
+            (now - self.stale_ttl, now - self.lease_timeout)
+        )
+
+
+def get_or_lease(cache, key):
+    """cache.get() with single flight when the backend supports it; returns (value, leased)."""
+    backend = cache.cache
+    if hasattr(backend, 'get_or_lease'):
+        return backend.get_or_lease(key)
+    return cache.get(key), False
+
+
+def release_lease(cache, key, leased):
+    if leased:
+        cache.cache.release(key)
+
+
+def cached_view(cache, timeout=None):
+    """cache.cached() for shared views, with single flight and early expiration.
+
+    Keyed on the request path like cache.cached(). On a miss only the lease
+    holder runs the view; other workers are served the stale response or wait
+    for the new one. Only 200 responses are cached.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = f"view/{request.path}"
+            cached, leased = get_or_lease(cache, key)
+            if cached is not None:
+                return Response(cached[0], mimetype=cached[1])
+            try:
+                resp = make_response(view(*args, **kwargs))
+            except Exception:
+                release_lease(cache, key, leased)
+                raise
+            if resp.status_code == 200:
+                cache.set(key, (resp.get_data(), resp.mimetype), timeout=timeout)
+            else:
+                release_lease(cache, key, leased)
+            return resp
+        return wrapper
+    return decorator
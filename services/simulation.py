@@ -0,0 +1,81 @@
+import numpy as np
+
+AXES = ("cost", "monthly", "rate", "years")
+MAX_CELLS = 100000
+MAX_YEARS = 40
+MAX_RATE = 1000  # percent a year
+
+
+def check_axes(axes):
+    """Raise ValueError unless every value of every axis (scalar or list) is usable.
+
+    Rates are percentages and must stay above -100 (a total loss every year);
+    years must be whole numbers from 1 to MAX_YEARS.
+    """
+    values = {name: np.atleast_1d(np.asarray(axes[name], dtype=float)) for name in AXES}
+    for name, a in values.items():
+        if not a.size:
+            raise ValueError(f"{name} must not be empty")
+        if not np.isfinite(a).all():
+            raise ValueError(f"{name} must be a finite number")
+    if ((values["years"] < 1) | (values["years"] > MAX_YEARS) | (values["years"] != np.round(values["years"]))).any():
+        raise ValueError(f"years must be a whole number from 1 to {MAX_YEARS}")
+    if ((values["rate"] <= -100) | (values["rate"] > MAX_RATE)).any():
+        raise ValueError(f"rate must be above -100 and at most {MAX_RATE} percent")
+
+
+def to_list(a, decimals=0):
+    """Rounded nested lists for JSON; cells that overflowed or have no solution become None."""
+    with np.errstate(over='ignore', invalid='ignore'):
+        a = np.round(a, decimals)
+    return np.where(np.isfinite(a), a, None).tolist()
+
+
+def _growth_terms(rate, years):
+    """(g^n, contribution factor) where a yearly contribution C paid at the start
+    of each year grows to C * factor after n years at annual rate `rate`."""
+    g = 1 + rate
+    with np.errstate(over='ignore', divide='ignore', invalid='ignore'):
+        gn = g ** years
+        factor = np.where(rate == 0, years, g * (gn - 1) / np.where(rate == 0, 1, rate))
+    return gn, factor
+
+
+def grid(axes):
+    """Broadcast the given axes against each other: one dimension per entry of AXES."""
+    arrays = [np.asarray(axes[name], dtype=float) for name in AXES]
+    cells = int(np.prod([a.size for a in arrays]))
+    if cells > MAX_CELLS:
+        raise ValueError(f"scenario grid has {cells} cells; the limit is {MAX_CELLS}")
+    return np.ix_(*arrays)
+
+
+def project(cost, monthly, rate, years):
+    """Closed-form (saved, invested) corpus for every scenario; inputs broadcast.
+
+    Matches the year-by-year loop this replaces: each year's 12 * monthly is
+    added at the start of the year and, when invested, compounded annually at
+    `rate` (a fraction, e.g. 0.12).
+    """
+    gn, factor = _growth_terms(rate, years)
+    with np.errstate(over='ignore', invalid='ignore'):
+        saved = cost + monthly * 12 * years
+        invested = cost * gn + monthly * 12 * factor
+    return saved, invested
+
+
+def required_monthly(target, cost, rate, years):
+    """Monthly amount needed to grow `cost` to `target`; 0 where cost alone suffices."""
+    gn, factor = _growth_terms(rate, years)
+    with np.errstate(over='ignore', divide='ignore', invalid='ignore'):
+        monthly = (target - cost * gn) / (12 * np.where(factor > 0, factor, 1))
+    return np.where(factor > 0, np.maximum(monthly, 0), np.nan)
+
+
+def yearly_trend(cost, monthly, rate, years):
+    """Per-year (saved, invested) values for a single scenario."""
+    n = np.arange(1, int(years) + 1)
+    saved, invested = project(cost, monthly, rate, n)
+    if not (np.isfinite(saved).all() and np.isfinite(invested).all()):
+        raise ValueError("amounts are too large to project")
+    return np.round(saved).astype(int).tolist(), np.round(invested).astype(int).tolist()
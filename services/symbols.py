@@ -0,0 +1,264 @@
+import os
+import csv
+import time
+import threading
+import click
+
+FIELDS = ('symbol', 'exchange', 'name', 'isin', 'sector')
+YAHOO_SUFFIX = {"NSE": ".NS", "BSE": ".BO"}
+# When a ticker is listed on both exchanges, resolve it to the first one here
+EXCHANGE_PRIORITY = ("NSE", "BSE")
+
+# Term kinds, in ranking order
+SYMBOL, ISIN, NAME = 0, 1, 2
+
+
+def read_master(path):
+    """Rows of the symbol master CSV as dicts with FIELDS keys."""
+    with open(path, newline='', encoding='utf-8') as f:
+        return [{k: (row.get(k) or '').strip() for k in FIELDS} for row in csv.DictReader(f)]
+
+
+def read_exchange_list(path, exchange=None):
+    """Normalise an exchange's listing file (or a master-format CSV) into master rows.
+
+    Understands NSE's EQUITY_L.csv (SYMBOL, NAME OF COMPANY, ISIN NUMBER) and
+    BSE's scrip list (Security Id, Security Name, ISIN No, Industry).
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        reader.fieldnames = [h.strip() for h in reader.fieldnames]
+        rows = []
+        for row in reader:
+            row = {k: (v or '').strip() for k, v in row.items() if k}
+            if 'NAME OF COMPANY' in row:
+                rows.append({"symbol": row['SYMBOL'], "exchange": "NSE", "name": row['NAME OF COMPANY'],
+                             "isin": row.get('ISIN NUMBER', ''), "sector": ''})
+            elif 'Security Id' in row:
+                rows.append({"symbol": row['Security Id'], "exchange": "BSE", "name": row.get('Security Name', ''),
+                             "isin": row.get('ISIN No', ''), "sector": row.get('Industry', '')})
+            else:
+                rows.append({k: row.get(k, '') for k in FIELDS})
+            if exchange:
+                rows[-1]["exchange"] = exchange
+    return [r for r in rows if r["symbol"]]
+
+
+def write_master(path, rows):
+    rows = sorted(rows, key=lambda r: (r["symbol"].upper(), r["exchange"]))
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, FIELDS, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, path)
+
+
+class SymbolMaster:
+    """Prefix index over the symbol master, stored as sorted NumPy arrays.
+
+    The index is built from the CSV on first use and saved as .npy files next
+    to it; every worker memory-maps the same files, so the OS page cache holds
+    one copy for the whole host. A newer CSV triggers a rebuild.
+
+    Search terms are the ticker, the ISIN and each word of the company name,
+    all upper-cased, in one sorted array; a prefix query is two binary
+    searches over it.
+
+    The bundled data/symbols.csv is only a seed (NSE large caps, no ISINs).
+    Load the full NSE and BSE lists with `flask load-symbols`.
+    """
+
+    RECHECK_INTERVAL = 60
+    ARRAYS = ('symbol', 'exchange', 'name', 'isin', 'sector', 'yahoo', 'symbol_key', 'terms', 'term_ids', 'term_kinds',
+              'term_rank')
+
+    def __init__(self, source, index_dir):
+        self.source = source
+        self.index_dir = index_dir
+        self._arrays = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def _paths(self):
+        return {name: os.path.join(self.index_dir, f"{name}.npy") for name in self.ARRAYS}
+
+    def _stale(self):
+        paths = self._paths().values()
+        if not all(os.path.exists(p) for p in paths):
+            return True
+        return os.path.getmtime(self.source) > min(os.path.getmtime(p) for p in paths)
+
+    def build(self):
+        import numpy as np
+        rows = read_master(self.source)
+        priority = {ex: i for i, ex in enumerate(EXCHANGE_PRIORITY)}
+        rows.sort(key=lambda r: (r["symbol"].upper(), priority.get(r["exchange"], len(priority))))
+
+        terms = []
+        for i, r in enumerate(rows):
+            terms.append((r["symbol"].upper(), SYMBOL, i))
+            if r["isin"]:
+                terms.append((r["isin"].upper(), ISIN, i))
+            for word in set(r["name"].upper().replace('&', ' ').replace('-', ' ').split()):
+                terms.append((word, NAME, i))
+        terms.sort()
+
+        arrays = {field: np.array([r[field] for r in rows], dtype=str) for field in FIELDS}
+        arrays["yahoo"] = np.array([r["symbol"] + YAHOO_SUFFIX.get(r["exchange"], "") for r in rows], dtype=str)
+        arrays["symbol_key"] = np.char.upper(arrays["symbol"])
+        arrays["terms"] = np.array([t[0] for t in terms], dtype=str)
+        arrays["term_kinds"] = np.array([t[1] for t in terms], dtype=np.int8)
+        arrays["term_ids"] = np.array([t[2] for t in terms], dtype=np.int32)
+        # Precomputed ordering within a prefix range: term kind, then ticker length, then row
+        ticker_len = np.char.str_len(arrays["symbol_key"]).clip(max=255).astype(np.int64)
+        arrays["term_rank"] = (arrays["term_kinds"].astype(np.int64) << 40
+                               | ticker_len[arrays["term_ids"]] << 32 | arrays["term_ids"])
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        for name, path in self._paths().items():
+            # Write-then-rename so a worker never maps a half-written file
+            tmp = f"{path}.{os.getpid()}.tmp.npy"
+            np.save(tmp, arrays[name])
+            os.replace(tmp, path)
+        return len(rows)
+
+    def _index(self):
+        now = time.time()
+        if self._arrays is None or now - self._checked_at > self.RECHECK_INTERVAL:
+            import numpy as np
+            with self._lock:
+                if self._arrays is None or now - self._checked_at > self.RECHECK_INTERVAL:
+                    # Also picks up an index rebuilt by `flask load-symbols` in another process
+                    if self._stale():
+                        self.build()
+                    self._arrays = {name: np.load(path, mmap_mode='r') for name, path in self._paths().items()}
+                    self._checked_at = now
+        return self._arrays
+
+    def _record(self, i):
+        a = self._index()
+        return {
+            "symbol": str(a["symbol"][i]),
+            "exchange": str(a["exchange"][i]),
+            "name": str(a["name"][i]),
+            "isin": str(a["isin"][i]),
+            "sector": str(a["sector"][i]),
+            "yahoo_symbol": str(a["yahoo"][i])
+        }
+
+    def lookup(self, symbol):
+        """Exact ticker (case-insensitive) or ISIN match, preferring NSE; None if unknown."""
+        import numpy as np
+        a = self._index()
+        key = symbol.strip().upper()
+        i = int(np.searchsorted(a["symbol_key"], key))
+        if i < len(a["symbol_key"]) and a["symbol_key"][i] == key:
+            return self._record(i)
+        lo, hi = np.searchsorted(a["terms"], key, 'left'), np.searchsorted(a["terms"], key, 'right')
+        for j in range(lo, hi):
+            if a["term_kinds"][j] == ISIN:
+                return self._record(int(a["term_ids"][j]))
+        return None
+
+    def search(self, query, limit=10):
+        """Instruments whose ticker, ISIN or a name word starts with each word of `query`.
+
+        Ticker matches rank before ISIN and name matches, and shorter tickers first.
+        """
+        import numpy as np
+        words = query.strip().upper().split()
+        if not words:
+            return []
+        a = self._index()
+        # Range-scan the longest word, then require the others as prefixes of the same record
+        words.sort(key=len, reverse=True)
+        lo, hi = np.searchsorted(a["terms"], [words[0], words[0] + '\uffff'])
+        ids, rank = a["term_ids"][lo:hi], a["term_rank"][lo:hi]
+        if len(words) > 1:
+            keep = np.ones(len(ids), dtype=bool)
+            for word in words[1:]:
+                wlo, whi = np.searchsorted(a["terms"], [word, word + '\uffff'])
+                keep &= np.isin(ids, a["term_ids"][wlo:whi])
+            ids, rank = ids[keep], rank[keep]
+        if not len(ids):
+            return [unlisted_bse_record(words[0])] if len(words) == 1 and is_bse_code(words[0]) else []
+
+        # A record can match through several terms, so keep some slack over `limit` before de-duplicating
+        if len(rank) > limit * 4:
+            top = np.argpartition(rank, limit * 4)[:limit * 4]
+            ids, rank = ids[top], rank[top]
+        candidates = ids[np.argsort(rank, kind='stable')].tolist()
+        if len(words) == 1:
+            # An exact ticker goes first even when longer tickers share its prefix
+            i = int(np.searchsorted(a["symbol_key"], words[0]))
+            if i < len(a["symbol_key"]) and a["symbol_key"][i] == words[0]:
+                candidates.insert(0, i)
+
+        seen, results = set(), []
+        for i in candidates:
+            if i in seen:
+                continue
+            seen.add(i)
+            results.append(self._record(i))
+            if len(results) == limit:
+                break
+        return results
+
+
+symbol_master = None
+
+
+def get_symbol_master(app):
+    global symbol_master
+    if symbol_master is None:
+        symbol_master = SymbolMaster(app.config['SYMBOL_MASTER_PATH'], app.config['SYMBOL_INDEX_DIR'])
+    return symbol_master
+
+
+def find_symbol(symbol):
+    """The master's record for a ticker or ISIN; None if unknown or the master is missing or unreadable."""
+    if symbol_master is None:
+        return None
+    try:
+        return symbol_master.lookup(symbol)
+    except (OSError, ValueError):
+        # A missing or corrupt index must not take the quote endpoints down with it
+        return None
+
+
+def resolve_yahoo(symbol):
+    record = find_symbol(symbol)
+    return record["yahoo_symbol"] if record else None
+
+
+def is_bse_code(symbol):
+    # BSE scrip codes are six digits (500325); NSE tickers always contain letters
+    return len(symbol) == 6 and symbol.isdigit()
+
+
+def unlisted_bse_record(code):
+    """Search result for a BSE scrip code the master doesn't know; Yahoo quotes it as <code>.BO."""
+    return {"symbol": code, "exchange": "BSE", "name": "", "isin": "", "sector": "", "yahoo_symbol": f"{code}.BO"}
+
+
+@click.command('load-symbols')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--exchange', type=click.Choice(YAHOO_SUFFIX), default=None, help='Force the exchange of every row.')
+def load_symbols_command(path, exchange):
+    """Merge an NSE/BSE listing file into the symbol master and rebuild its index.
+
+    The master shipped in data/symbols.csv is a small NSE seed; load NSE's
+    EQUITY_L.csv and BSE's scrip list to cover every listed ticker and ISIN.
+    """
+    from flask import current_app
+    master = get_symbol_master(current_app)
+    existing = {(r["symbol"], r["exchange"]): r for r in read_master(master.source)} if os.path.exists(master.source) else {}
+    incoming = read_exchange_list(path, exchange)
+    for row in incoming:
+        current = existing.setdefault((row["symbol"], row["exchange"]), dict(row))
+        # Keep fields the new file leaves blank (e.g. sectors missing from NSE's list)
+        current.update({k: v for k, v in row.items() if v})
+    write_master(master.source, existing.values())
+    count = master.build()
+    click.echo(f"Merged {len(incoming)} row(s); symbol master now has {count} instrument(s).")
@@ -0,0 +1,158 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import case, func
+from extensions import cache
+from models import db, Transaction
+from services.ledger import get_summary
+
+INTERVALS = ('day', 'week', 'month')
+
+
+def bucket_expr(interval):
+    """SQL expression labelling Transaction.date with its bucket start as 'YYYY-MM-DD'."""
+    if db.engine.dialect.name == 'postgresql':
+        return func.to_char(func.date_trunc(interval, Transaction.date), 'YYYY-MM-DD')
+    if interval == 'month':
+        return func.strftime('%Y-%m-01', Transaction.date)
+    if interval == 'week':
+        # SQLite: move to the following Sunday, then back to that week's Monday
+        return func.date(Transaction.date, 'weekday 0', '-6 days')
+    return func.date(Transaction.date)
+
+
+def bucket_label(interval, when):
+    """Python twin of bucket_expr() for a single datetime."""
+    d = when.date() if isinstance(when, datetime) else when
+    if interval == 'month':
+        d = d.replace(day=1)
+    elif interval == 'week':
+        d = d - timedelta(days=d.weekday())
+    return d.isoformat()
+
+
+def next_label(interval, label):
+    d = date.fromisoformat(label)
+    if interval == 'month':
+        return (d.replace(day=28) + timedelta(days=4)).replace(day=1).isoformat()
+    return (d + timedelta(days=7 if interval == 'week' else 1)).isoformat()
+
+
+def prev_label(interval, label):
+    d = date.fromisoformat(label)
+    if interval == 'month':
+        return (d - timedelta(days=1)).replace(day=1).isoformat()
+    return (d - timedelta(days=7 if interval == 'week' else 1)).isoformat()
+
+
+def _fingerprint(user_id):
+    # Any write that reaches the ledger summary changes this, so entries cached
+    # by another worker are detected as stale without tracking them explicitly
+    s = get_summary(user_id)
+    return (s.tx_count, round(s.total_income, 6), round(s.total_expenses, 6), str(s.last_activity))
+
+
+def _cache_key(user_id, interval):
+    return f"ts:{user_id}:{interval}"
+
+
+def buckets_query(user_id, interval):
+    bucket = bucket_expr(interval).label('bucket')
+    return db.session.query(
+        bucket,
+        func.sum(case((Transaction.amount > 0, Transaction.amount), else_=0)),
+        func.sum(case((Transaction.amount < 0, -Transaction.amount), else_=0)),
+        func.count(Transaction.id)
+    ).filter(Transaction.user_id == user_id).group_by(bucket).order_by(bucket)
+
+
+def _query_buckets(user_id, interval):
+    rows = buckets_query(user_id, interval).all()
+    return [[label, float(income), float(expenses), count] for label, income, expenses, count in rows]
+
+
+def get_buckets(user_id, interval):
+    """Per-bucket [label, income, expenses, count] rows, cached per user and interval."""
+    fingerprint = _fingerprint(user_id)
+    entry = cache.get(_cache_key(user_id, interval))
+    if entry and entry["fingerprint"] == fingerprint:
+        return entry["buckets"]
+
+    buckets = _query_buckets(user_id, interval)
+    cache.set(_cache_key(user_id, interval), {"fingerprint": fingerprint, "buckets": buckets}, timeout=86400)
+    return buckets
+
+
+def extend_series(tx, sign=1):
+    """Patch this user's cached series for an added (sign=1) or deleted (sign=-1) transaction.
+
+    Call after the commit. Only series that were current before the write are
+    patched; anything else is left to be rebuilt on the next read.
+    """
+    before = None
+    for interval in INTERVALS:
+        key = _cache_key(tx.user_id, interval)
+        entry = cache.get(key)
+        if not entry:
+            continue
+        if before is None:
+            s = get_summary(tx.user_id)
+            # Undo this write to get the fingerprint the cached entry should carry
+            before = (
+                s.tx_count - sign,
+                round(s.total_income - sign * max(tx.amount, 0), 6),
+                round(s.total_expenses - sign * max(-tx.amount, 0), 6)
+            )
+            after = _fingerprint(tx.user_id)
+        if entry["fingerprint"][:3] != before:
+            cache.delete(key)
+            continue
+
+        buckets = entry["buckets"]
+        label = bucket_label(interval, tx.date)
+        row = next((b for b in buckets if b[0] == label), None)
+        if row is None:
+            row = [label, 0.0, 0.0, 0]
+            buckets.append(row)
+            buckets.sort(key=lambda b: b[0])
+        row[1] += sign * max(tx.amount, 0)
+        row[2] += sign * max(-tx.amount, 0)
+        row[3] += sign
+        if row[3] <= 0:
+            buckets.remove(row)
+        cache.set(key, {"fingerprint": after, "buckets": buckets}, timeout=86400)
+
+
+def balance_series(user, interval='month', periods=None, end=None):
+    """Gap-filled series of income, expenses, net flow and running balance.
+
+    The running balance starts from user.initial_balance. With `periods`, only
+    the last N buckets ending at `end` (default: today) are returned, and the
+    balance carries forward through buckets with no activity.
+    """
+    buckets = get_buckets(user.id, interval)
+    by_label = {b[0]: b for b in buckets}
+
+    last = bucket_label(interval, end or datetime.now())
+    if buckets and buckets[-1][0] > last:
+        last = buckets[-1][0]
+    first = last
+    for _ in range((periods or 1) - 1):
+        first = prev_label(interval, first)
+    if buckets and buckets[0][0] < first:
+        first = buckets[0][0]
+
+    series = {"labels": [], "income": [], "expenses": [], "net": [], "balance": []}
+    balance = user.initial_balance
+    label = first
+    while label <= last:
+        _, income, expenses, _ = by_label.get(label, (label, 0.0, 0.0, 0))
+        balance += income - expenses
+        series["labels"].append(label)
+        series["income"].append(round(income, 2))
+        series["expenses"].append(round(expenses, 2))
+        series["net"].append(round(income - expenses, 2))
+        series["balance"].append(round(balance, 2))
+        label = next_label(interval, label)
+
+    if periods:
+        series = {k: v[-periods:] for k, v in series.items()}
+    return series
@@ -0,0 +1,95 @@
+import io
+import csv
+import json
+import base64
+from datetime import datetime
+from sqlalchemy import and_, or_
+from models import Transaction
+
+EXPORT_BATCH = 1000
+EXPORT_FIELDS = ("id", "date", "description", "amount", "category")
+
+
+def encode_cursor(tx):
+    return base64.urlsafe_b64encode(f"{tx.date.isoformat()}|{tx.id}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        date_str, tx_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(date_str), int(tx_id)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+def ledger_query(user_id, category=None, start=None, end=None):
+    """A user's transactions newest-first on (date, id), the order of ix_transaction_user_date_id."""
+    query = Transaction.query.filter(Transaction.user_id == user_id)
+    if category:
+        query = query.filter(Transaction.category == category)
+    if start:
+        query = query.filter(Transaction.date >= start)
+    if end:
+        query = query.filter(Transaction.date < end)
+    return query.order_by(Transaction.date.desc(), Transaction.id.desc())
+
+
+def page(query, cursor=None, limit=50):
+    """Seek past `cursor` rather than OFFSET, so pages stay stable while rows are inserted.
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    if cursor:
+        after_date, after_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Transaction.date < after_date,
+            and_(Transaction.date == after_date, Transaction.id < after_id)
+        ))
+    rows = query.limit(limit + 1).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, (encode_cursor(rows[-1]) if more and rows else None)
+
+
+def serialize(tx):
+    return {
+        "id": tx.id,
+        "date": tx.date.isoformat(),
+        "description": tx.description,
+        "amount": tx.amount,
+        "category": tx.category
+    }
+
+
+def _stream(query):
+    # Server-side cursor where the driver supports it; yield_per bounds the ORM buffer either way
+    try:
+        yield from query.execution_options(stream_results=True).yield_per(EXPORT_BATCH)
+    finally:
+        # The body streams after the view's teardown removed this session from the
+        # registry, so nothing else would give its connection back to the pool
+        query.session.close()
+
+
+def export_csv(query):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for n, tx in enumerate(_stream(query), start=1):
+        writer.writerow((tx.id, tx.date.isoformat(), tx.description, tx.amount, tx.category))
+        if n % EXPORT_BATCH == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_ndjson(query):
+    lines = []
+    for tx in _stream(query):
+        lines.append(json.dumps(serialize(tx)))
+        if len(lines) == EXPORT_BATCH:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
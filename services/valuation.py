@@ -0,0 +1,104 @@
+from datetime import datetime
+import numpy as np
+
+DAYS_PER_YEAR = 365.0
+
+
+def xirr(amounts, years_ago, terminal):
+    """Annualised rate r at which the outflows `amounts` (paid `years_ago`) grow to `terminal` today.
+
+    Solves terminal = sum(amounts * (1 + r) ** years_ago) by bisection; the
+    right-hand side is increasing in r, so the root is unique. Returns None when
+    there is nothing to annualise (no cost, or nothing held for a year yet:
+    annualising a few days' move gives meaningless rates).
+    """
+    amounts = np.asarray(amounts, dtype=float)
+    years_ago = np.asarray(years_ago, dtype=float)
+    if not amounts.size or amounts.sum() <= 0 or years_ago.max() < 1 or terminal <= 0:
+        return None
+
+    def excess(rate):
+        return np.sum(amounts * np.power(1 + rate, years_ago)) - terminal
+
+    low, high = -0.9999, 1.0
+    while excess(high) < 0 and high < 1e6:
+        high *= 10
+    for _ in range(100):
+        mid = (low + high) / 2
+        if excess(mid) < 0:
+            low = mid
+        else:
+            high = mid
+        if high - low < 1e-9:
+            break
+    return (low + high) / 2
+
+
+def value_holdings(holdings, quotes, as_of=None):
+    """Value a portfolio in one vectorised pass.
+
+    `holdings` is a list of dicts with id, symbol, company_name, quantity,
+    avg_cost and added_at; `quotes` maps symbols to quote dicts as returned by
+    QuoteService.get_quotes(). Holdings without a quote are listed but left out
+    of the totals, weights and XIRR.
+    """
+    as_of = as_of or datetime.utcnow()
+    n = len(holdings)
+    qty = np.fromiter((h["quantity"] or 0 for h in holdings), float, n)
+    avg_cost = np.fromiter((h["avg_cost"] or 0 for h in holdings), float, n)
+    price = np.fromiter((quotes[h["symbol"]]["price"] if h["symbol"] in quotes else np.nan for h in holdings), float, n)
+    change = np.fromiter((quotes[h["symbol"]]["change"] if h["symbol"] in quotes else np.nan for h in holdings), float, n)
+    years_ago = np.fromiter(((as_of - h["added_at"]).days / DAYS_PER_YEAR if h["added_at"] else 0 for h in holdings),
+                            float, n)
+
+    priced = ~np.isnan(price)
+    cost = qty * avg_cost
+    value = qty * price
+    pnl = value - cost
+    total_value = float(value[priced].sum())
+    total_cost = float(cost[priced].sum())
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        # change = -100 would mean yesterday's close was infinite
+        day_pnl = np.where(np.isfinite(change) & (change > -100), value - value / (1 + change / 100), np.nan)
+        pnl_pct = np.where(cost > 0, pnl / cost * 100, np.nan)
+        weight = value / total_value * 100 if total_value else np.full(n, np.nan)
+        # Each holding is a single buy, so its XIRR has a closed form; like xirr(), skip holdings under a year
+        holding_xirr = np.where((cost > 0) & (years_ago >= 1),
+                                np.power(value / cost, 1 / years_ago) - 1, np.nan) * 100
+
+    def num(a, digits=2):
+        with np.errstate(over='ignore', invalid='ignore'):
+            a = a.round(digits)
+        return [x if np.isfinite(x) else None for x in a.tolist()]
+
+    columns = {
+        "price": num(price), "market_value": num(value), "cost_basis": num(cost),
+        "unrealized_pnl": num(pnl), "unrealized_pnl_pct": num(pnl_pct), "day_pnl": num(day_pnl),
+        "weight": num(weight), "xirr": num(holding_xirr)
+    }
+    rows = []
+    for i, h in enumerate(holdings):
+        row = {
+            "id": h["id"],
+            "symbol": h["symbol"],
+            "company_name": h["company_name"],
+            "quantity": float(qty[i]),
+            "avg_cost": float(avg_cost[i])
+        }
+        row.update({k: v[i] for k, v in columns.items()})
+        rows.append(row)
+
+    rate = xirr(cost[priced], years_ago[priced], total_value)
+    return {
+        "holdings": rows,
+        "totals": {
+            "market_value": round(total_value, 2),
+            "cost_basis": round(total_cost, 2),
+            "unrealized_pnl": round(total_value - total_cost, 2),
+            "unrealized_pnl_pct": round((total_value - total_cost) / total_cost * 100, 2) if total_cost else None,
+            "day_pnl": round(float(np.nansum(day_pnl[priced])), 2),
+            "xirr": None if rate is None else round(rate * 100, 2)
+        },
+        "as_of": as_of.isoformat()
+    }
@@ -0,0 +1,97 @@
+import hashlib
+from datetime import date
+from functools import wraps
+from flask import Response, make_response, request
+from flask_login import current_user
+from sqlalchemy import event, update
+from extensions import cache
+from models import db, User
+from services.sharedcache import get_or_lease, release_lease
+
+RESPONSE_CACHE_TIMEOUT = 300
+# Bounds how long a version published out of order by two racing writers can be served
+VERSION_CACHE_TIMEOUT = 300
+_PENDING = 'data_version_pending'
+
+
+def _version_key(user_id):
+    return f"data_version:{int(user_id)}"
+
+
+def bump_data_version(user_id):
+    """Mark every cached read of this user's data as stale (no commit).
+
+    Runs as a SQL increment inside the caller's transaction, so the new version
+    becomes visible together with the write it describes. The shared cache
+    gets the new version once the transaction commits.
+    """
+    version = db.session.execute(
+        update(User).where(User.id == user_id).values(data_version=User.data_version + 1)
+        .returning(User.data_version).execution_options(synchronize_session=False)
+    ).scalar()
+    db.session.info.setdefault(_PENDING, {})[int(user_id)] = version
+
+
+def data_version(user_id):
+    """The user's committed data version, from the shared cache when it is there."""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = db.session.query(User.data_version).filter(User.id == user_id).scalar() or 0
+        # add(), not set(): a writer that committed since our read has already published a newer version
+        cache.add(key, version, timeout=VERSION_CACHE_TIMEOUT)
+    return version
+
+
+@event.listens_for(db.session, 'after_commit')
+def _publish_versions(session):
+    for user_id, version in session.info.pop(_PENDING, {}).items():
+        key = _version_key(user_id)
+        current = cache.get(key)
+        if current is None or current < version:
+            cache.set(key, version, timeout=VERSION_CACHE_TIMEOUT)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _drop_versions(session):
+    session.info.pop(_PENDING, None)
+
+
+def versioned(view):
+    """Serve a per-user read endpoint with a strong ETag derived from the data version.
+
+    The version is read from the shared cache, so a matching If-None-Match is
+    answered with 304 without any SQL. Misses are
+    looked up in a response cache keyed by (user, version, URL) before falling
+    back to the view. The date is part of the tag because month-to-date figures
+    change at midnight without any write.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version = data_version(current_user.id)
+        tag_source = f"{current_user.id}:{version}:{date.today().isoformat()}:{request.full_path}"
+        etag = hashlib.sha1(tag_source.encode()).hexdigest()
+
+        if etag in request.if_none_match:
+            resp = Response(status=304)
+        else:
+            key = f"resp:{etag}"
+            cached, leased = get_or_lease(cache, key)
+            if cached is not None:
+                resp = Response(cached[0], mimetype=cached[1])
+            else:
+                try:
+                    resp = make_response(view(*args, **kwargs))
+                except Exception:
+                    release_lease(cache, key, leased)
+                    raise
+                if resp.status_code != 200:
+                    # Errors aren't cached; let the next request for this key retry at once
+                    release_lease(cache, key, leased)
+                    return resp
+                cache.set(key, (resp.get_data(), resp.mimetype), timeout=RESPONSE_CACHE_TIMEOUT)
+
+        resp.set_etag(etag)
+        resp.headers['Cache-Control'] = 'private, no-cache'
+        return resp
+    return wrapper
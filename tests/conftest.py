@@ -0,0 +1,48 @@
+import os
+import sys
+import uuid
+import tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# config.Config reads the environment at import time, so every data file is
+# pointed at a scratch directory before the app is imported
+_data = tempfile.mkdtemp(prefix='finance-tests-')
+os.environ.update({
+    'DATABASE_URL': 'sqlite:///' + os.path.join(_data, 'app.db'),
+    'CACHE_SQLITE_PATH': os.path.join(_data, 'cache.db'),
+    'HISTORY_DB_PATH': os.path.join(_data, 'history.db'),
+    'UPSTREAM_GUARD_PATH': os.path.join(_data, 'guard.db'),
+    'SYMBOL_INDEX_DIR': os.path.join(_data, 'symbol_index'),
+    'METRICS_DIR': os.path.join(_data, 'metrics'),
+    'QUOTE_REFRESHER_ENABLED': '0',
+})
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def user(app):
+    """A fresh user row without the demo data signup seeds; yields its id inside an app context."""
+    from models import db, User
+    with app.app_context():
+        user = User(email=f"{uuid.uuid4().hex}@example.com", name='Test User', password='x')
+        db.session.add(user)
+        db.session.commit()
+        yield user.id
+
+
+@pytest.fixture
+def client(app):
+    """A test client signed up (and so logged in) as a new user."""
+    client = app.test_client()
+    client.post('/signup', data={'email': f"{uuid.uuid4().hex}@example.com", 'name': 'Test User', 'password': 'pw'})
+    return client
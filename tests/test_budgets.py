@@ -0,0 +1,37 @@
+from models import db, Budget, User
+
+
+def budgets(client):
+    return {b["name"]: b for b in client.get('/api/budgets').get_json()}
+
+
+def _user_id(client):
+    with client.session_transaction() as session:
+        return int(session['_user_id'])
+
+
+def test_read_computes_spend_without_writing(app, client):
+    client.post('/api/budgets', json={"name": "Travel", "limit": 1000})
+    client.post('/api/transactions', json={"description": "Train", "amount": -250, "category": "Travel"})
+    user_id = _user_id(client)
+    with app.app_context():
+        budget = Budget.query.filter_by(user_id=user_id, name="Travel").one()
+        budget.spent = 999  # Out of date, as after a month rollover
+        db.session.commit()
+        version = db.session.get(User, user_id).data_version
+
+    assert budgets(client)["Travel"]["spent"] == 250
+    with app.app_context():
+        assert Budget.query.filter_by(user_id=user_id, name="Travel").one().spent == 999
+        assert db.session.get(User, user_id).data_version == version
+
+
+def test_writes_keep_stored_spend_current(app, client):
+    client.post('/api/transactions', json={"description": "Cinema", "amount": -400, "category": "Movies"})
+    # A new budget picks up spend already in the ledger
+    client.post('/api/budgets', json={"name": "Movies", "limit": 1000})
+    client.post('/api/transactions', json={"description": "Popcorn", "amount": -100, "category": "Movies"})
+    with app.app_context():
+        budget = Budget.query.filter_by(user_id=_user_id(client), name="Movies").one()
+        assert budget.spent == 500
+    assert budgets(client)["Movies"]["transactions"] == 2
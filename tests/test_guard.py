@@ -0,0 +1,75 @@
+import time
+import pytest
+from services.guard import UNKNOWN_SYMBOL, UpstreamGuard, UpstreamUnavailable
+from services.quotes import GuardedQuoteProvider, StaticQuoteProvider
+
+
+@pytest.fixture
+def make_guard(tmp_path):
+    # Guards on one path stand in for separate workers sharing the state file
+    def make(**kwargs):
+        return UpstreamGuard(str(tmp_path / 'guard.db'), 'yahoo', **kwargs)
+    return make
+
+
+def test_token_bucket_caps_the_combined_rate(make_guard):
+    a, b = make_guard(rate=0.001, burst=3), make_guard(rate=0.001, burst=3)
+    assert a.acquire(2) == 2
+    assert b.acquire(5) == 1
+    assert a.acquire() == 0
+    with pytest.raises(UpstreamUnavailable, match="rate limited"):
+        b.check()
+
+
+def test_breaker_opens_for_every_worker_and_lets_one_trial_through(make_guard):
+    a, b = make_guard(failure_threshold=2, reset_timeout=0.2), make_guard(failure_threshold=2, reset_timeout=0.2)
+    a.failure()
+    assert b.allow()
+    a.failure()
+    assert not b.allow()
+    with pytest.raises(UpstreamUnavailable, match="circuit open"):
+        b.check()
+
+    time.sleep(0.25)
+    assert [a.allow(), b.allow()] == [True, False]
+    a.success()
+    assert b.allow()
+    assert b.status()["breakers"]["yahoo"] == {"failures": 0, "open": False}
+
+
+def test_breakers_are_kept_per_scope(make_guard):
+    guard = make_guard(failure_threshold=1)
+    guard.failure('feed-a')
+    assert not guard.allow('feed-a')
+    assert guard.allow('feed-b') and guard.allow()
+
+
+def test_negative_cache_expires(make_guard):
+    guard = make_guard(negative_ttl=0.2)
+    guard.mark_negative({"BAD.NS": UNKNOWN_SYMBOL})
+    assert make_guard().negative(["BAD.NS", "TCS.NS"]) == {"BAD.NS": UNKNOWN_SYMBOL}
+    time.sleep(0.25)
+    assert guard.negative(["BAD.NS"]) == {}
+
+
+def test_guarded_provider_skips_known_bad_symbols_and_open_circuits(make_guard):
+    provider = StaticQuoteProvider(fail={"BAD.NS"})
+    guarded = GuardedQuoteProvider(provider, make_guard(failure_threshold=1))
+
+    quotes, errors = guarded.fetch(["BAD.NS", "TCS.NS"])
+    assert set(quotes) == {"TCS.NS"} and errors == {"BAD.NS": UNKNOWN_SYMBOL}
+    # Known bad: answered without a call
+    assert guarded.fetch(["BAD.NS"]) == ({}, {"BAD.NS": UNKNOWN_SYMBOL})
+    assert provider.calls == 1
+
+    guarded.guard.failure()
+    assert guarded.fetch(["TCS.NS"]) == ({}, {"TCS.NS": "upstream unavailable"})
+    assert provider.calls == 1
+
+
+def test_guarded_provider_only_sends_what_the_bucket_allows(make_guard):
+    provider = StaticQuoteProvider()
+    guarded = GuardedQuoteProvider(provider, make_guard(rate=0.001, burst=2))
+    quotes, errors = guarded.fetch(["A.NS", "B.NS", "C.NS"])
+    assert len(quotes) == 2
+    assert list(errors.values()) == ["rate limited"]
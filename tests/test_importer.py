@@ -0,0 +1,78 @@
+import io
+from datetime import datetime
+from models import db, Budget, Transaction
+from services import importer
+from services.importer import import_statement, ofx_records
+
+
+def ofx(*transactions):
+    body = ''.join(f"<STMTTRN><DTPOSTED>{when}<TRNAMT>{amount}<FITID>{fitid}<NAME>{name}</STMTTRN>"
+                   for fitid, when, amount, name in transactions)
+    return io.BytesIO(f"<OFX><BANKTRANLIST>{body}</BANKTRANLIST></OFX>".encode())
+
+
+def csv_file(*rows, header="date,amount,description"):
+    return io.BytesIO((header + "\n" + "".join(f"{r}\n" for r in rows)).encode())
+
+
+def count(user_id):
+    return Transaction.query.filter_by(user_id=user_id).count()
+
+
+def test_csv_counts_and_reimport(user):
+    rows = ("2026-01-05,-120,Coffee", "2026-01-05,-120,Coffee", "05/01/2026,5000,Salary", "someday,10,Bad date")
+    report = import_statement(user, csv_file(*rows), 'csv')
+    # Identical rows on one statement are separate transactions
+    assert (report["inserted"], report["duplicates"], report["rejected"]) == (3, 0, 1)
+    assert report["errors"][0]["row"] == 5
+
+    report = import_statement(user, csv_file(*rows), 'csv')
+    assert (report["inserted"], report["duplicates"], report["rejected"]) == (0, 3, 1)
+    assert count(user) == 3
+
+
+def test_ofx_repeated_fitid_counts_as_duplicate(user):
+    statement = [("T1", "20260105", "-50.00", "Cab"), ("T1", "20260105", "-50.00", "Cab"),
+                 ("T2", "20260106", "1000", "Refund"), ("T3", "20260107", "", "No amount")]
+    report = import_statement(user, ofx(*statement), 'ofx')
+    assert (report["inserted"], report["duplicates"], report["rejected"]) == (2, 1, 1)
+    assert sum(report[k] for k in ("inserted", "duplicates", "rejected")) == len(statement)
+
+    report = import_statement(user, ofx(*statement), 'ofx')
+    assert (report["inserted"], report["duplicates"], report["rejected"]) == (0, 3, 1)
+    assert count(user) == 2
+
+
+def test_import_route_rejects_malformed_csv(client):
+    body = b'date,amount,description\n2026-01-05,1,"' + b'x' * 200000 + b'"\n'
+    resp = client.post('/api/transactions/import', data={'file': (io.BytesIO(body), 'statement.csv')},
+                       content_type='multipart/form-data')
+    assert resp.status_code == 400
+    assert resp.get_json()["message"].startswith("Malformed CSV")
+
+
+def test_repeats_are_counted_across_chunks(user, monkeypatch):
+    monkeypatch.setattr(importer, 'CHUNK_SIZE', 2)
+    rows = ("2026-01-05,-120,Coffee", "2026-01-06,-80,Bus", "2026-01-05,-120,Coffee", "2026-01-05,-120,Coffee")
+    assert import_statement(user, csv_file(*rows), 'csv')["inserted"] == 4
+    assert import_statement(user, csv_file(*rows), 'csv')["duplicates"] == 4
+
+
+def test_ofx_multibyte_text_split_across_chunks():
+    stream = ofx(("T1", "20260105", "-50", "Café ₹ Zoë"))
+    # A 3-byte chunk splits the multi-byte characters
+    [(_, record, error)] = list(ofx_records(stream, chunk_size=3))
+    assert error is None
+    assert record["description"] == "Café ₹ Zoë"
+
+
+def test_import_updates_budget_spend(user):
+    budget = Budget(user_id=user, name="Dining Out", limit=5000, spent=0)
+    db.session.add(budget)
+    db.session.commit()
+    today = datetime.now().strftime('%Y-%m-%d')
+    rows = (f"{today},-300,Pizza,Dining Out", f"{today},-200,Sushi,Dining Out", f"{today},1000,Refund,Salary",
+            "2001-01-01,-999,Old dinner,Dining Out")
+    import_statement(user, csv_file(*rows, header="date,amount,description,category"), 'csv')
+    db.session.refresh(budget)
+    assert budget.spent == 500
@@ -0,0 +1,30 @@
+import pytest
+
+
+def advise(client, **body):
+    return client.post('/api/invest/ai', json=dict(body, paths=500))
+
+
+def test_default_target_is_reported(client):
+    data = advise(client, amount=50000, risk='high', age=25).get_json()["data"]
+    assert data["target"] == 100000
+    assert data["target_source"] == "default (2x amount)"
+    assert data["allocation"][0]["label"] == "Stocks"
+    assert data["projection"]["goal"] == 100000
+    assert 0 <= data["projection"]["probability"] <= 1
+
+
+def test_explicit_target(client):
+    data = advise(client, amount=50000, target=60000, years=5).get_json()["data"]
+    assert (data["target"], data["target_source"]) == (60000, "request")
+    assert data["projection"]["years"] == [1, 2, 3, 4, 5]
+
+
+@pytest.mark.parametrize("body", [
+    {"years": "ten"}, {"amount": "lots"}, {"target": "double"}, {"age": None},
+    {"amount": -5}, {"monthly": "nan"}, {"target": "inf"},
+])
+def test_bad_numbers_are_rejected(client, body):
+    resp = advise(client, **body)
+    assert resp.status_code == 400
+    assert resp.get_json()["status"] == "error"
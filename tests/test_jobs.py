@@ -0,0 +1,124 @@
+import os
+import sys
+import socket
+import subprocess
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+import pytest
+from models import db
+from services import jobs
+from services.jobs import JobRunner
+
+
+class InlineExecutor:
+    """Runs work in the submitting thread, so the job finishes before submit() returns."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class PendingExecutor:
+    """Never starts the work."""
+
+    def submit(self, fn, *args):
+        return Future()
+
+
+def _fail(params):
+    raise RuntimeError("boom")
+
+
+@pytest.fixture(autouse=True)
+def kinds(monkeypatch):
+    monkeypatch.setitem(jobs.JOB_KINDS, 'echo', (lambda params, app: params, lambda params: {"echo": params}))
+    monkeypatch.setitem(jobs.JOB_KINDS, 'fail', (lambda params, app: params, _fail))
+
+
+def runner(executor):
+    runner = JobRunner()
+    runner._executor = lambda: executor
+    return runner
+
+
+def submit(executor, app, user, kind, params):
+    job = runner(executor).submit(app, user, kind, params)
+    # _finish commits from its own session, as a poll from another request would see it
+    db.session.expire_all()
+    return job
+
+
+def test_job_finished_during_submit_stays_done(app, user):
+    job = submit(InlineExecutor(), app, user, 'echo', {"n": 1})
+    assert job.status == 'done'
+    assert jobs.serialize_job(job)["result"] == {"echo": {"n": 1}}
+
+
+def test_failed_job(app, user):
+    job = submit(InlineExecutor(), app, user, 'fail', {"n": 2})
+    assert job.status == 'failed'
+    assert job.error == 'boom'
+    assert job.finished_at is not None
+
+
+def test_running_job_is_shared_and_cancellable(app, user):
+    r = runner(PendingExecutor())
+    job = r.submit(app, user, 'echo', {"n": 3})
+    assert job.status == 'running'
+    assert r.submit(app, user, 'echo', {"n": 3}).id == job.id
+
+    assert r.cancel(user, job.id).status == 'cancelled'
+    assert r.get(user, job.id).status == 'cancelled'
+
+
+def test_finished_result_is_reused(app, user):
+    first = submit(InlineExecutor(), app, user, 'echo', {"n": 4})
+    reused = submit(PendingExecutor(), app, user, 'echo', {"n": 4})
+    assert reused.id != first.id
+    assert reused.status == 'done'
+    assert reused.result == first.result
+
+
+def test_unknown_kind(app, user):
+    with pytest.raises(ValueError):
+        runner(InlineExecutor()).submit(app, user, 'nope', {})
+
+
+def _age(job, seconds):
+    job.created_at = job.heartbeat_at = datetime.utcnow() - timedelta(seconds=seconds)
+    db.session.commit()
+
+
+def test_job_running_in_another_worker_is_not_lost(app, user):
+    job = runner(PendingExecutor()).submit(app, user, 'echo', {"n": 5})
+    assert job.owner.endswith(f":{os.getpid()}")
+    # Polled through a worker that doesn't hold the future, long after submission
+    job.created_at = datetime.utcnow() - timedelta(hours=1)
+    db.session.commit()
+    assert JobRunner(lost_after=60).get(user, job.id).status == 'running'
+
+
+def test_heartbeat_keeps_a_long_job_alive(app, user):
+    r = runner(PendingExecutor())
+    job = r.submit(app, user, 'echo', {"n": 6})
+    _age(job, 3600)
+    r.beat(app)
+    db.session.expire_all()
+    assert JobRunner(lost_after=60).get(user, job.id).status == 'running'
+
+    _age(job, 3600)
+    assert JobRunner(lost_after=60).get(user, job.id).error == 'job lost'
+
+
+def test_job_of_an_exited_worker_is_lost_at_once(app, user):
+    job = runner(PendingExecutor()).submit(app, user, 'echo', {"n": 7})
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+    job.owner = f"{socket.gethostname()}:{exited.pid}"
+    db.session.commit()
+    job = JobRunner(lost_after=3600).get(user, job.id)
+    assert (job.status, job.error) == ('failed', 'job lost')
@@ -0,0 +1,38 @@
+import os
+from services.metrics import MetricsRegistry, metrics
+
+
+def test_scrape_counts_requests_sql_and_cache(client):
+    client.get('/api/dashboard')
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'http_requests_total{endpoint="api.dashboard_api",method="GET",status="200"}' in body
+    assert 'sql_queries_total{endpoint="api.dashboard_api"}' in body
+    assert 'cache_requests_total{prefix="resp",result="miss"}' in body
+    assert 'http_request_duration_seconds_bucket{endpoint="api.dashboard_api",method="GET",le="+Inf"}' in body
+
+
+def test_only_publishing_processes_write_files(tmp_path):
+    registry = MetricsRegistry(directory=str(tmp_path))
+    registry.inc("http_requests_total", endpoint="x", method="GET", status="200")
+    registry.flush()
+    assert os.listdir(tmp_path) == []
+
+    registry.publish()
+    registry.flush()
+    assert os.listdir(tmp_path) == [f"metrics-{os.getpid()}.json"]
+
+
+def test_other_workers_files_are_summed(tmp_path):
+    worker = MetricsRegistry(directory=str(tmp_path))
+    worker.publish()
+    worker.inc("upstream_requests_total", 3, upstream="yahoo", call="quote", outcome="ok")
+    worker.flush()
+    os.rename(tmp_path / f"metrics-{os.getpid()}.json", tmp_path / "metrics-1.json")
+
+    scraper = MetricsRegistry(directory=str(tmp_path))
+    scraper.inc("upstream_requests_total", 2, upstream="yahoo", call="quote", outcome="ok")
+    assert 'upstream_requests_total{call="quote",outcome="ok",upstream="yahoo"} 5' in scraper.render()
+
+
+def test_app_process_does_not_publish(app):
+    assert not metrics.publishing
@@ -0,0 +1,46 @@
+import pytest
+from services.quotes import INDEX_TICKERS, QuoteService, StaticQuoteProvider
+from services.refresher import QuoteRefresher
+from services.sharedcache import SQLiteCache
+
+
+@pytest.fixture
+def workers(tmp_path):
+    # Two workers on one host: separate quote stores, one shared cache
+    shared = SQLiteCache(path=str(tmp_path / 'cache.db'))
+    return [QuoteRefresher(QuoteService(StaticQuoteProvider(), shared=shared), interval=60) for _ in range(2)]
+
+
+def test_one_worker_refreshes_for_the_host(app, workers):
+    leader, follower = workers
+    leader.run_once(app)
+    follower.run_once(app)
+    assert (leader.leading, follower.leading) == (True, False)
+    assert follower.service.provider.calls == 0
+
+    quotes, missing = follower.service.peek(list(INDEX_TICKERS.values()))
+    assert not missing and len(quotes) == len(INDEX_TICKERS)
+    assert follower.last_run == leader.last_run
+
+
+def test_symbols_watched_by_a_follower_are_fetched_by_the_leader(app, workers):
+    leader, follower = workers
+    leader.run_once(app)
+    follower.watch(["INFY"])
+    follower.run_once(app)
+    leader.run_once(app)
+    assert "INFY.NS" in leader.service.ages()
+
+    follower.run_once(app)
+    assert follower.service.version > 0
+    assert follower.service.changed_since(["INFY"], 0)["INFY"]["price"] > 0
+    assert follower.service.provider.calls == 0
+
+
+def test_another_worker_takes_over_when_the_leader_stops(app, workers):
+    leader, follower = workers
+    leader.run_once(app)
+    leader.stop()
+    follower.run_once(app)
+    assert follower.leading
+    assert follower.service.provider.calls == 1
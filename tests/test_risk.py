@@ -0,0 +1,31 @@
+import pytest
+from services.history import HistoryStore, StaticHistoryProvider
+from services.risk import portfolio_risk
+
+
+class PartlyUnknownProvider(StaticHistoryProvider):
+    def fetch(self, symbol, start=None):
+        if symbol.startswith('BOGUS'):
+            raise LookupError("unknown symbol: no price history")
+        return super().fetch(symbol, start)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return HistoryStore(str(tmp_path / 'history.db'), provider=PartlyUnknownProvider(years=2))
+
+
+def test_unknown_holding_is_reported_missing(store):
+    report = portfolio_risk(store, {"RELIANCE": 10, "TCS": 5, "BOGUSXYZ": 3})
+    assert report["missing"] == ["BOGUSXYZ"]
+    assert report["symbols"] == ["RELIANCE", "TCS"]
+    assert "error" not in report
+    assert set(report["per_symbol"]) == {"RELIANCE", "TCS"}
+    assert sum(report["weights"].values()) == pytest.approx(100, abs=0.05)
+    assert len(report["correlation"]) == 2
+
+
+def test_only_unknown_holdings(store):
+    report = portfolio_risk(store, {"BOGUSABC": 1})
+    assert report["missing"] == ["BOGUSABC"]
+    assert report["error"] == "Not enough price history"
@@ -0,0 +1,97 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from flask import Flask, jsonify
+from flask_caching import Cache
+from services.sharedcache import SQLiteCache, cached_view
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SQLiteCache(path=str(tmp_path / 'cache.db'), wait_timeout=0.2)
+
+
+def test_get_and_set(cache):
+    assert cache.get('k') is None
+    cache.set('k', {'a': 1})
+    assert cache.get('k') == {'a': 1}
+    assert cache.has('k')
+    cache.delete('k')
+    assert cache.get('k') is None
+
+
+def test_get_miss_takes_no_lease(cache):
+    cache.get('k')
+    cache.get('k')
+    assert cache.get_or_lease('k') == (None, True)
+
+
+def test_lease_holder_is_waited_for(cache):
+    assert cache.get_or_lease('k') == (None, True)
+    start = time.time()
+    # Nothing stale to serve: the second caller waits, then gives up
+    assert cache.get_or_lease('k') == (None, False)
+    assert time.time() - start >= 0.2
+
+    cache.set('k', 'fresh')
+    assert cache.get_or_lease('k') == ('fresh', False)
+
+
+def test_release_lets_the_next_caller_recompute(cache):
+    assert cache.get_or_lease('k') == (None, True)
+    cache.release('k')
+    assert cache.get('k') is None
+    assert cache.get_or_lease('k') == (None, True)
+
+
+def test_expired_value_is_served_stale_while_one_caller_recomputes(cache):
+    cache.set('k', 'old', timeout=1)
+    time.sleep(1.1)
+    assert cache.get('k') is None
+    assert cache.get_or_lease('k') == (None, True)
+    assert cache.get_or_lease('k') == ('old', False)
+
+    cache.set('k', 'new')
+    assert cache.get_or_lease('k') == ('new', False)
+
+
+@pytest.fixture
+def view_app(tmp_path):
+    app = Flask(__name__)
+    view_cache = Cache(app, config={'CACHE_TYPE': 'services.sharedcache.SQLiteCache',
+                                    'CACHE_SQLITE_PATH': str(tmp_path / 'views.db')})
+    calls = []
+
+    @app.route('/slow')
+    @cached_view(view_cache, timeout=60)
+    def slow():
+        calls.append(1)
+        time.sleep(0.3)
+        return jsonify(n=len(calls))
+
+    @app.route('/broken')
+    @cached_view(view_cache, timeout=60)
+    def broken():
+        calls.append(1)
+        return jsonify(error='upstream down'), 502
+
+    app.calls = calls
+    return app
+
+
+def test_cached_view_runs_concurrent_misses_once(view_app):
+    def fetch(_):
+        return view_app.test_client().get('/slow').get_json()
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        bodies = list(pool.map(fetch, range(6)))
+    assert len(view_app.calls) == 1
+    assert bodies == [{'n': 1}] * 6
+
+
+def test_cached_view_does_not_cache_errors(view_app):
+    client = view_app.test_client()
+    start = time.time()
+    assert [client.get('/broken').status_code for _ in range(3)] == [502] * 3
+    assert len(view_app.calls) == 3
+    assert time.time() - start < 1
@@ -0,0 +1,58 @@
+import json
+import pytest
+
+
+def simulate(client, **body):
+    resp = client.post('/api/simulation', json=body)
+    # Strict JSON: no NaN or Infinity anywhere in the body
+    json.loads(resp.get_data(as_text=True), parse_constant=lambda c: pytest.fail(f"non-JSON constant {c}"))
+    return resp
+
+
+def test_scalar_projection(client):
+    resp = simulate(client, cost=1000, monthly=100, rate=12, years=3)
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["labels"] == ["Year 1", "Year 2", "Year 3"]
+    assert data["base_trend"] == [2200, 3400, 4600]
+    assert data["sim_trend"][-1] > data["base_trend"][-1]
+
+
+def test_negative_rate_advice(client):
+    data = simulate(client, monthly=100, rate=-10, years=5).get_json()
+    assert "behind just saving" in data["advice"]
+
+
+@pytest.mark.parametrize("body", [
+    {"years": 0}, {"years": 41}, {"years": 2.5}, {"years": "ten"},
+    {"years": [0, 10]}, {"years": [1e6]}, {"years": []},
+    {"rate": -100}, {"rate": -200}, {"rate": [12, -200]},
+    {"cost": "nan"}, {"monthly": [1, "inf"]},
+    {"mode": "goal_seek", "years": [0, 10], "target": 1e6},
+    {"mode": "goal_seek", "target": "inf"},
+])
+def test_invalid_inputs_are_rejected(client, body):
+    resp = simulate(client, **body)
+    assert resp.status_code == 400
+    assert resp.get_json()["status"] == "error"
+
+
+def test_grid(client):
+    data = simulate(client, cost=0, monthly=[100, 200], rate=[0, 10], years=[1, 2]).get_json()
+    assert data["shape"] == [1, 2, 2, 2]
+    assert data["invested"][0][0][0] == [1200, 2400]
+    # Saving ignores the rate, so that axis is not broadcast
+    assert data["saved"][0][1][0] == [2400, 4800]
+
+
+def test_grid_overflow_is_null(client):
+    data = simulate(client, cost=[1e300], rate=[1000], years=[40]).get_json()
+    assert data["invested"] == [[[[None]]]]
+
+
+def test_goal_seek(client):
+    data = simulate(client, mode="goal_seek", target=12000, cost=[0, 20000], rate=[0], years=[1, 10]).get_json()
+    assert data["shape"] == [2, 1, 2]
+    assert data["monthly"][0][0] == [1000, 100]
+    # Cost alone already reaches the target
+    assert data["monthly"][1][0] == [0, 0]
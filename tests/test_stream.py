@@ -0,0 +1,45 @@
+import json
+import pytest
+from services.quotes import quote_service
+from services.refresher import QuoteRefresher
+
+
+@pytest.fixture
+def stream_config(app, monkeypatch):
+    monkeypatch.setattr(QuoteRefresher, 'running', property(lambda self: True))
+    for key, value in (('STREAM_MAX_CONNECTIONS', 1), ('STREAM_HEARTBEAT', 0.05), ('STREAM_MAX_DURATION', 0.2)):
+        monkeypatch.setitem(app.config, key, value)
+
+
+def test_stream_needs_the_refresher(client):
+    resp = client.get('/api/market/stream')
+    assert resp.status_code == 503
+
+
+def test_stream_sends_moved_quotes_then_heartbeats(client, stream_config):
+    quote_service.store({"^NSEI": {"price": 22000.0, "prev_close": 21890.0}, "STREAM.NS": {"price": 10.0, "prev_close": 8.0}})
+    resp = client.get('/api/market/stream?symbols=STREAM')
+    assert resp.mimetype == 'text/event-stream'
+    chunks = [c.decode() for c in resp.response]
+    resp.close()
+
+    assert chunks[0] == "retry: 5000\n\n"
+    event = json.loads(chunks[1].split("data: ", 1)[1])
+    assert {"symbol": "^NSEI", "name": "NIFTY 50"}.items() <= event["indices"][0].items()
+    assert event["stocks"] == [{"symbol": "STREAM", "price": 10.0, "change": 25.0, "stale": False}]
+    # Nothing moved after the first event, and the connection ends at STREAM_MAX_DURATION
+    assert set(chunks[2:]) == {": heartbeat\n\n"}
+
+
+def test_connection_cap_frees_the_slot_on_close(client, stream_config):
+    first = client.get('/api/market/stream')
+    assert first.status_code == 200
+    busy = client.get('/api/market/stream')
+    assert busy.status_code == 503
+    assert busy.get_json()["error"] == "Too many live connections"
+
+    # Closed without reading the body, as when a client disconnects at once
+    first.close()
+    again = client.get('/api/market/stream')
+    assert again.status_code == 200
+    again.close()
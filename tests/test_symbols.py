@@ -0,0 +1,61 @@
+import pytest
+from services import symbols
+from services.quotes import to_yahoo_symbol
+from services.symbols import SymbolMaster, find_symbol, read_exchange_list, write_master
+
+ROWS = [
+    {"symbol": "RELIANCE", "exchange": "NSE", "name": "Reliance Industries", "isin": "INE002A01018", "sector": "Energy"},
+    {"symbol": "RELIANCE", "exchange": "BSE", "name": "Reliance Industries", "isin": "INE002A01018", "sector": "Energy"},
+    {"symbol": "RELINFRA", "exchange": "NSE", "name": "Reliance Infrastructure", "isin": "INE036A01016", "sector": "Infra"},
+    {"symbol": "TATAMOTORS", "exchange": "NSE", "name": "Tata Motors", "isin": "INE155A01022", "sector": "Auto"},
+    {"symbol": "TATASTEEL", "exchange": "NSE", "name": "Tata Steel", "isin": "INE081A01020", "sector": "Metals"},
+]
+
+
+@pytest.fixture
+def master(tmp_path):
+    source = tmp_path / 'symbols.csv'
+    write_master(str(source), ROWS)
+    return SymbolMaster(str(source), str(tmp_path / 'index'))
+
+
+def test_lookup_prefers_nse_and_resolves_isin(master):
+    assert master.lookup("reliance")["yahoo_symbol"] == "RELIANCE.NS"
+    assert master.lookup("INE155A01022")["symbol"] == "TATAMOTORS"
+    assert master.lookup("NOPE") is None
+
+
+def test_search_ranks_tickers_first_and_matches_every_word(master):
+    found = [(r["symbol"], r["exchange"]) for r in master.search("reli")]
+    assert found == [("RELIANCE", "NSE"), ("RELIANCE", "BSE"), ("RELINFRA", "NSE")]
+    assert [r["symbol"] for r in master.search("tata steel")] == ["TATASTEEL"]
+    assert [r["symbol"] for r in master.search("motors tata")] == ["TATAMOTORS"]
+
+
+def test_unknown_bse_code_degrades_to_bo_listing(master):
+    assert master.search("500325") == [{"symbol": "500325", "exchange": "BSE", "name": "", "isin": "",
+                                        "sector": "", "yahoo_symbol": "500325.BO"}]
+    assert master.search("50032") == []
+
+
+def test_bse_scrip_list_is_normalised(tmp_path):
+    listing = tmp_path / 'bse.csv'
+    listing.write_text("Security Code,Security Id,Security Name,ISIN No,Industry\n"
+                       "500325,RELIANCE,Reliance Industries Ltd,INE002A01018,Refineries\n")
+    assert read_exchange_list(str(listing)) == [{"symbol": "RELIANCE", "exchange": "BSE", "name": "Reliance Industries Ltd",
+                                                 "isin": "INE002A01018", "sector": "Refineries"}]
+
+
+def test_unreadable_index_falls_back_to_suffix_rule(master, monkeypatch):
+    master.lookup("RELIANCE")
+    for path in master._paths().values():
+        with open(path, 'wb') as f:
+            f.write(b'\x93NUMPY corrupt')
+    master._arrays = None
+    master._checked_at = 0
+    # Keep the corrupt files rather than rebuilding them from the CSV
+    monkeypatch.setattr(master, '_stale', lambda: False)
+    monkeypatch.setattr(symbols, 'symbol_master', master)
+    assert find_symbol("RELIANCE") is None
+    assert to_yahoo_symbol("RELIANCE") == "RELIANCE.NS"
+    assert to_yahoo_symbol("500325") == "500325.BO"
@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+from datetime import datetime
+from models import db, Transaction
+from services import transactions
+
+
+def _user_id(client):
+    with client.session_transaction() as session:
+        return int(session['_user_id'])
+
+
+def add(app, client, n, when=datetime(2026, 3, 1, 9, 30), category="Paging"):
+    with app.app_context():
+        db.session.add_all(Transaction(user_id=_user_id(client), description=f"tx {i}", amount=-i,
+                                       category=category, date=when) for i in range(n))
+        db.session.commit()
+
+
+def pages(client, url):
+    ids, cursor = [], None
+    while True:
+        body = client.get(url + (f"&cursor={cursor}" if cursor else "")).get_json()
+        ids.append([t["id"] for t in body["transactions"]])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+def test_cursor_pages_cover_every_row_once(app, client):
+    # Every row shares one timestamp, so only the id breaks ties
+    add(app, client, 12)
+    ids = pages(client, '/api/transactions?category=Paging&limit=5')
+    assert [len(p) for p in ids] == [5, 5, 2]
+    flat = [i for p in ids for i in p]
+    assert flat == sorted(set(flat), reverse=True)
+
+
+def test_insert_between_pages_does_not_shift_the_next_page(app, client):
+    add(app, client, 6)
+    first = client.get('/api/transactions?category=Paging&limit=3').get_json()
+    add(app, client, 2, when=datetime(2026, 3, 2))
+    second = client.get(f"/api/transactions?category=Paging&limit=3&cursor={first['next_cursor']}").get_json()
+    seen = {t["id"] for t in first["transactions"]}
+    assert len(second["transactions"]) == 3
+    assert not seen & {t["id"] for t in second["transactions"]}
+    assert second["next_cursor"] is None
+
+
+def test_bad_cursor_is_rejected(client):
+    resp = client.get('/api/transactions?cursor=not-a-cursor')
+    assert resp.status_code == 400
+    assert resp.get_json()["message"] == "invalid cursor"
+
+
+def test_exports_stream_every_row(app, client, monkeypatch):
+    monkeypatch.setattr(transactions, 'EXPORT_BATCH', 2)
+    add(app, client, 5)
+
+    resp = client.get('/api/transactions/export?format=csv&category=Paging')
+    assert resp.mimetype == 'text/csv'
+    assert resp.headers['Content-Disposition'] == 'attachment; filename=transactions.csv'
+    rows = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+    assert [r["description"] for r in rows] == [f"tx {i}" for i in range(4, -1, -1)]
+
+    resp = client.get('/api/transactions/export?format=ndjson&category=Paging')
+    records = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert [r["id"] for r in records] == [int(r["id"]) for r in rows]
+    assert records[0]["amount"] == -4
+
+
+def test_unknown_export_format(client):
+    assert client.get('/api/transactions/export?format=xml').status_code == 400
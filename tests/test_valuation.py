@@ -0,0 +1,51 @@
+import json
+from datetime import datetime, timedelta
+from services.valuation import value_holdings
+
+AS_OF = datetime(2026, 1, 1)
+
+
+def holding(symbol, quantity=10, avg_cost=100, days=800):
+    return {"id": symbol, "symbol": symbol, "company_name": symbol, "quantity": quantity, "avg_cost": avg_cost,
+            "added_at": AS_OF - timedelta(days=days) if days is not None else None}
+
+
+def test_empty_portfolio():
+    result = value_holdings([], {}, AS_OF)
+    assert result["holdings"] == []
+    assert result["totals"]["market_value"] == 0
+    assert result["totals"]["xirr"] is None
+
+
+def test_two_year_holding_is_annualised():
+    result = value_holdings([holding("A", days=730)], {"A": {"price": 200, "change": 0}}, AS_OF)
+    row = result["holdings"][0]
+    assert row["market_value"] == 2000
+    assert row["unrealized_pnl_pct"] == 100
+    assert abs(row["xirr"] - 41.42) < 0.05
+    assert abs(result["totals"]["xirr"] - 41.42) < 0.05
+
+
+def test_holdings_under_a_year_are_not_annualised():
+    result = value_holdings([holding("A", days=3)], {"A": {"price": 500, "change": 1}}, AS_OF)
+    assert result["holdings"][0]["xirr"] is None
+    assert result["totals"]["xirr"] is None
+
+
+def test_non_finite_figures_become_null():
+    result = value_holdings([holding("A"), holding("B", avg_cost=0)],
+                            {"A": {"price": 120, "change": -100}, "B": {"price": 5, "change": 0}}, AS_OF)
+    a, b = result["holdings"]
+    assert a["day_pnl"] is None
+    assert b["unrealized_pnl_pct"] is None
+    assert b["xirr"] is None
+    json.dumps(result, allow_nan=False)
+
+
+def test_unpriced_holdings_are_left_out_of_totals():
+    result = value_holdings([holding("A"), holding("B")], {"A": {"price": 150, "change": 0}}, AS_OF)
+    missing = result["holdings"][1]
+    assert missing["price"] is None and missing["market_value"] is None
+    assert result["totals"]["market_value"] == 1500
+    assert result["totals"]["cost_basis"] == 1000
+    assert result["holdings"][0]["weight"] == 100
@@ -0,0 +1,69 @@
+import time
+from sqlalchemy import event
+from extensions import cache
+from models import db
+from services.versioning import bump_data_version, data_version
+
+
+def test_unchanged_data_answers_304(client):
+    first = client.get('/api/dashboard')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    again = client.get('/api/dashboard', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == etag
+
+
+def test_write_changes_the_etag(client):
+    first = client.get('/api/dashboard')
+    assert client.post('/api/user/balance', json={'balance': 1234}).status_code == 200
+
+    after = client.get('/api/dashboard', headers={'If-None-Match': first.headers['ETag']})
+    assert after.status_code == 200
+    assert after.headers['ETag'] != first.headers['ETag']
+    assert after.get_json()['chart']['data'][0] == 1234
+
+
+def test_cached_response_is_replayed(client):
+    first = client.get('/api/dashboard')
+    second = client.get('/api/dashboard')
+    assert second.status_code == 200
+    assert second.get_data() == first.get_data()
+
+
+def test_errors_are_not_cached_and_do_not_block_retries(client):
+    url = '/api/dashboard/timeseries?interval=day&periods=0'
+    start = time.time()
+    for _ in range(3):
+        resp = client.get(url)
+        assert resp.status_code == 400
+        assert 'ETag' not in resp.headers
+    # A lease left behind by the first miss would make each retry wait for CACHE wait_timeout
+    assert time.time() - start < 1
+
+
+def test_not_modified_runs_no_sql(client, app):
+    etag = client.get('/api/dashboard').headers['ETag']
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        assert client.get('/api/dashboard', headers={'If-None-Match': etag}).status_code == 304
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    assert statements == []
+
+
+def test_rolled_back_bump_is_not_published(app, user):
+    with app.app_context():
+        before = data_version(user)
+        bump_data_version(user)
+        db.session.rollback()
+        assert data_version(user) == before
+
+        bump_data_version(user)
+        db.session.commit()
+        assert cache.get(f"data_version:{user}") == before + 1